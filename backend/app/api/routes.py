@@ -1,23 +1,38 @@
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import json
 import uuid
 from app.models.requests import (
     RecommendationRequest, 
     ChatRequest, 
     TryOnRequest, 
+    BatchTryOnRequest,
     FeedbackRequest, 
-    RefreshRequest
+    RefreshRequest,
+    BatchOperation,
+    BatchRequest
 )
 from app.models.responses import (
     RecommendationResponse, 
     RecommendationResponseV2,
     ChatResponse, 
     TryOnResponse, 
+    BatchTryOnResponse,
     FeedbackResponse, 
     HealthResponse,
-    ErrorResponse
+    ErrorResponse,
+    ProductItem,
+    BatchResult,
+    BatchResponse
 )
+from app.services.openai_service import OpenAIService, TRYON_GRID_MAX_PRODUCTS
+from app.services.recommendation_service import RecommendationService
+from app.utils.data_paths import resolve_styles_csv_path
 from app.utils.logging import get_logger
+from app.utils.ttl_cache import TTLCache
 from app.config import settings
 from app import __version__
 import os
@@ -25,17 +40,77 @@ import os
 logger = get_logger(__name__)
 router = APIRouter()
 
-# Dependency to get recommendation service from main.py
-async def get_recommendation_service():
-    from app.main import get_recommendation_service_async
-    service = await get_recommendation_service_async()
+def _model_response(model: BaseModel) -> Response:
+    """
+    Serialize an already-validated response model straight to JSON bytes
+    The route's response_model still documents the schema, but FastAPI skips re-validating the payload
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+_product_list_adapter = TypeAdapter(List[ProductItem])
+
+# Recommendation service singleton, populated once by the app lifespan handler
+_service: Optional[RecommendationService] = None
+
+def set_recommendation_service(service: Optional[RecommendationService]) -> None:
+    """Register the initialized recommendation service for request handlers"""
+    global _service
+    _service = service
+
+# Dependency to get recommendation service (kept async so it is awaited directly, not run in a threadpool)
+async def get_recommendation_service() -> RecommendationService:
+    service = _service
     if service is None:
-        raise HTTPException(status_code=503, detail="Recommendation service not initialized")
+        # Cold path for runtimes that skip the lifespan handler
+        from app.main import get_or_create_recommendation_service
+        service = await get_or_create_recommendation_service()
+        if service is None:
+            raise HTTPException(status_code=503, detail="Recommendation service not initialized")
+        set_recommendation_service(service)
     return service
 
-# OpenAI service for specific endpoints that need it
-from app.services.openai_service import OpenAIService
-openai_service = OpenAIService()
+# Semantic caches for near-duplicate recommendation requests
+from app.services.semantic_cache import SemanticCache
+recommendation_cache = SemanticCache()
+recommendation_v2_cache = SemanticCache()
+
+async def _semantic_cache_key(
+    request: RecommendationRequest,
+    openai_service: OpenAIService
+) -> Optional[Tuple[Tuple, List[float]]]:
+    """
+    Build the (scope, embedding) cache key for a recommendation request
+    Returns None when the request should bypass the cache
+    """
+    if not settings.semantic_cache_enabled:
+        return None
+
+    # Image analysis and explicit excludes make results request-specific
+    if request.inspiration_images or (request.filters and request.filters.exclude_ids):
+        return None
+
+    profile = request.user_profile
+    scope = (
+        profile.gender.value,
+        tuple(sorted(profile.preferred_article_types)),
+        tuple(sorted(style.value for style in profile.preferred_styles)),
+        tuple(sorted(profile.preferred_colors)),
+        request.top_k,
+        request.items_per_category
+    )
+    key_text = SemanticCache.build_key_text(
+        profile.gender.value,
+        profile.preferred_article_types,
+        profile.shopping_prompt
+    )
+
+    try:
+        embedding = await openai_service.get_query_embedding(key_text)
+    except Exception as e:
+        logger.warning(f"Semantic cache key embedding failed, bypassing cache: {e}")
+        return None
+
+    return scope, embedding
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check(recommendation_service = Depends(get_recommendation_service)):
@@ -65,8 +140,51 @@ async def health_check(recommendation_service = Depends(get_recommendation_servi
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=500, detail="Health check failed")
 
+def _final_stage_line(response: RecommendationResponse) -> str:
+    return json.dumps({
+        "stage": "final",
+        "items": [item.model_dump(mode="json") for item in response.recommendations],
+        "total_available": response.total_available,
+        "session_id": response.session_id
+    }) + "\n"
+
+async def _stream_recommendations(
+    request: RecommendationRequest,
+    recommendation_service: RecommendationService,
+    cache_key: Optional[Tuple[Tuple, List[float]]] = None,
+    cached_response: Optional[RecommendationResponse] = None
+) -> AsyncIterator[str]:
+    """
+    Yield NDJSON lines: raw vector results first, then the GPT-ranked final list
+    """
+    if cached_response is not None:
+        yield _final_stage_line(cached_response)
+        return
+
+    try:
+        async for stage, payload in recommendation_service.iter_recommendations(request):
+            if stage == "vector":
+                yield json.dumps({
+                    "stage": "vector",
+                    "items": [item.model_dump(mode="json") for item in payload]
+                }) + "\n"
+            else:
+                if cache_key:
+                    recommendation_cache.store(cache_key[1], cache_key[0], payload)
+                yield _final_stage_line(payload)
+    except Exception as e:
+        logger.error(f"Error streaming recommendations: {e}")
+        yield json.dumps({
+            "stage": "error",
+            "detail": f"Failed to generate recommendations: {str(e)}"
+        }) + "\n"
+
 @router.post("/recommendations", response_model=RecommendationResponse)
-async def get_recommendations(request: RecommendationRequest, recommendation_service = Depends(get_recommendation_service)):
+async def get_recommendations(
+    request: RecommendationRequest,
+    stream: bool = False,
+    recommendation_service = Depends(get_recommendation_service)
+):
     """
     Get personalized outfit recommendations
     
@@ -76,6 +194,9 @@ async def get_recommendations(request: RecommendationRequest, recommendation_ser
     3. Performs vector similarity search on product catalog
     4. Enhances ranking with GPT-4o mini
     5. Returns top-20 recommendations
+    
+    With ?stream=true the response is NDJSON: a "vector" stage with raw search
+    results as soon as they are available, then a "final" stage with GPT ranking.
     """
     try:
         logger.info(f"Received recommendation request for {request.user_profile.gender} user")
@@ -86,18 +207,36 @@ async def get_recommendations(request: RecommendationRequest, recommendation_ser
                 status_code=400, 
                 detail="Shopping prompt is required"
             )
-        
-        # Ensure top_k is within reasonable limits
-        if request.top_k > 50:
-            request.top_k = 50
-        elif request.top_k < 1:
-            request.top_k = 20
-        
+
+        # Serve near-duplicate requests from the semantic cache
+        cache_key = await _semantic_cache_key(request, recommendation_service.openai_service)
+        if cache_key:
+            cached = recommendation_cache.lookup(cache_key[1], cache_key[0])
+            if cached is not None:
+                session_id = request.session_id or str(uuid.uuid4())
+                if await recommendation_service.fork_session(cached.session_id, session_id):
+                    response = cached.model_copy(update={"session_id": session_id})
+                    if stream:
+                        return StreamingResponse(
+                            _stream_recommendations(request, recommendation_service, cached_response=response),
+                            media_type="application/x-ndjson"
+                        )
+                    return _model_response(response)
+
+        if stream:
+            return StreamingResponse(
+                _stream_recommendations(request, recommendation_service, cache_key=cache_key),
+                media_type="application/x-ndjson"
+            )
+
         # Get recommendations
         response = await recommendation_service.get_recommendations(request)
-        
+
+        if cache_key:
+            recommendation_cache.store(cache_key[1], cache_key[0], response)
+
         logger.info(f"Successfully generated {len(response.recommendations)} recommendations")
-        return response
+        return _model_response(response)
         
     except HTTPException:
         raise
@@ -135,25 +274,30 @@ async def get_recommendations_v2(request: RecommendationRequest, recommendation_
                 detail="Shopping prompt is required"
             )
         
-        # Set default items per category if not specified
+        # Set default items per category if not specified (range is clamped by the model)
         if not request.items_per_category:
             request.items_per_category = 20
-        
-        # Ensure items_per_category is within reasonable limits
-        if request.items_per_category > 50:
-            request.items_per_category = 50
-        elif request.items_per_category < 1:
-            request.items_per_category = 20
-        
+
+        # Serve near-duplicate requests from the semantic cache
+        cache_key = await _semantic_cache_key(request, recommendation_service.openai_service)
+        if cache_key:
+            cached = recommendation_v2_cache.lookup(cache_key[1], cache_key[0])
+            if cached is not None:
+                logger.info("V2 API: Serving recommendations from semantic cache")
+                return _model_response(cached.model_copy(update={"session_id": request.session_id or str(uuid.uuid4())}))
+
         # Get V2 recommendations
         response = await recommendation_service.get_recommendations_v2(request)
-        
+
+        if cache_key and response.success:
+            recommendation_v2_cache.store(cache_key[1], cache_key[0], response)
+
         if response.success:
             logger.info(f"V2 API: Successfully generated {response.debug_info.total_items} recommendations across {len(response.categories)} categories")
         else:
             logger.error(f"V2 API: Failed to generate recommendations: {response.error}")
         
-        return response
+        return _model_response(response)
         
     except HTTPException:
         raise
@@ -167,12 +311,49 @@ async def get_recommendations_v2(request: RecommendationRequest, recommendation_
             session_id=str(uuid.uuid4())
         )
 
+async def _stream_chat(
+    request: ChatRequest,
+    context: Dict,
+    session_id: str,
+    openai_service: OpenAIService
+) -> AsyncIterator[str]:
+    """
+    Yield NDJSON lines: a "delta" per chunk of reply text, then a "final" line shaped like ChatResponse
+    """
+    # Known from the user's message alone, before any reply text exists
+    context_updated = openai_service.message_updates_context(request.message)
+    parts = []
+    async for delta in openai_service.stream_chat_with_assistant(
+        message=request.message,
+        context=context,
+        history=request.history
+    ):
+        parts.append(delta)
+        yield json.dumps({"stage": "delta", "content": delta}) + "\n"
+
+    yield json.dumps({
+        "stage": "final",
+        **ChatResponse(
+            message="".join(parts).strip(),
+            context_updated=context_updated,
+            suggestions=[],
+            session_id=session_id
+        ).model_dump(mode="json")
+    }) + "\n"
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat_with_assistant(request: ChatRequest, recommendation_service = Depends(get_recommendation_service)):
+async def chat_with_assistant(
+    request: ChatRequest,
+    stream: bool = False,
+    recommendation_service = Depends(get_recommendation_service)
+):
     """
     Chat with Ray, the fashion assistant
     
     Provides contextual fashion advice and helps refine user preferences
+    
+    With ?stream=true the response is NDJSON: "delta" lines carry reply text as it
+    is generated, then a "final" line carries the same fields as the JSON response.
     """
     try:
         logger.info(f"Received chat request for session {request.session_id}")
@@ -182,7 +363,7 @@ async def chat_with_assistant(request: ChatRequest, recommendation_service = Dep
         
         # Get session context if available
         if request.session_id:
-            session_context = recommendation_service.get_session_context(request.session_id)
+            session_context = await recommendation_service.get_session_context(request.session_id)
             if session_context:
                 context.update(session_context)
         
@@ -196,16 +377,22 @@ async def chat_with_assistant(request: ChatRequest, recommendation_service = Dep
             if "current_recommendations" in request.context:
                 context["current_recommendations"] = request.context["current_recommendations"]
         
+        # Generate session ID if not provided
+        session_id = request.session_id or str(uuid.uuid4())
+        
+        if stream:
+            return StreamingResponse(
+                _stream_chat(request, context, session_id, recommendation_service.openai_service),
+                media_type="application/x-ndjson"
+            )
+        
         # Chat with assistant
-        response_message, context_updated = await openai_service.chat_with_assistant(
+        response_message, context_updated = await recommendation_service.openai_service.chat_with_assistant(
             message=request.message,
             context=context,
             history=request.history
         )
         
-        # Generate session ID if not provided
-        session_id = request.session_id or str(uuid.uuid4())
-        
         return ChatResponse(
             message=response_message,
             context_updated=context_updated,
@@ -221,7 +408,7 @@ async def chat_with_assistant(request: ChatRequest, recommendation_service = Dep
         )
 
 @router.post("/tryon", response_model=TryOnResponse)
-async def virtual_tryon(request: TryOnRequest):
+async def virtual_tryon(request: TryOnRequest, recommendation_service = Depends(get_recommendation_service)):
     """
     Generate ultra-high-fidelity virtual try-on image using enhanced AI analysis
     
@@ -232,7 +419,7 @@ async def virtual_tryon(request: TryOnRequest):
         logger.info(f"Received enhanced virtual try-on request for product {request.product_id}")
         
         # Get actual product details from vector service
-        product_item = await _get_product_by_id(request.product_id)
+        product_item = await _get_product_by_id(request.product_id, recommendation_service)
         
         if not product_item:
             raise HTTPException(
@@ -243,10 +430,11 @@ async def virtual_tryon(request: TryOnRequest):
         logger.info(f"Processing virtual try-on with enhanced analysis for {product_item.name}")
         
         # Generate enhanced virtual try-on image with detailed analysis
-        image_url, generation_prompt = await openai_service.generate_virtual_tryon(
+        image_url, generation_prompt = await recommendation_service.openai_service.generate_virtual_tryon(
             user_image_b64=request.user_image,
             product_item=product_item,
-            style_prompt=request.style_prompt
+            style_prompt=request.style_prompt,
+            hd=request.hd
         )
         
         logger.info(f"Successfully generated enhanced virtual try-on for product {request.product_id}")
@@ -267,6 +455,84 @@ async def virtual_tryon(request: TryOnRequest):
             detail=f"Enhanced virtual try-on failed: {str(e)}"
         )
 
+@router.post("/tryon/batch", response_model=BatchTryOnResponse)
+async def virtual_tryon_batch(request: BatchTryOnRequest, recommendation_service = Depends(get_recommendation_service)):
+    """
+    Generate virtual try-on images of several products for one selfie
+    
+    The selfie is analyzed once and the generations run concurrently, so trying on
+    a whole look takes about as long as a single try-on. Products that fail to
+    generate are returned with success=false.
+    
+    With grid=true, 2-4 products are rendered as panels of one image in a single
+    generation, falling back to individual images if that fails.
+    """
+    try:
+        logger.info(f"Received batch virtual try-on request for {len(request.product_ids)} products")
+        
+        product_items = await asyncio.gather(
+            *(_get_product_by_id(product_id, recommendation_service) for product_id in request.product_ids)
+        )
+        missing = [product_id for product_id, item in zip(request.product_ids, product_items) if not item]
+        if missing:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"Products not found: {', '.join(missing)}"
+            )
+        
+        openai_service = recommendation_service.openai_service
+        if request.grid and 2 <= len(product_items) <= TRYON_GRID_MAX_PRODUCTS:
+            try:
+                grid_image_url, generation_prompt = await openai_service.generate_virtual_tryon_grid(
+                    user_image_b64=request.user_image,
+                    product_items=product_items,
+                    style_prompt=request.style_prompt,
+                    hd=request.hd
+                )
+                return BatchTryOnResponse(
+                    results=[
+                        TryOnResponse(
+                            generated_image_url=grid_image_url,
+                            product_id=product_id,
+                            generation_prompt=generation_prompt,
+                            success=True
+                        )
+                        for product_id in request.product_ids
+                    ],
+                    grid_image_url=grid_image_url
+                )
+            except Exception as e:
+                logger.warning(f"Try-on grid generation failed, generating products individually: {e}")
+        
+        tryons = await openai_service.generate_virtual_tryons_batch(
+            user_image_b64=request.user_image,
+            product_items=product_items,
+            style_prompt=request.style_prompt,
+            hd=request.hd
+        )
+        
+        results = []
+        for product_id, tryon in zip(request.product_ids, tryons):
+            image_url, generation_prompt = tryon if tryon else ("", "")
+            results.append(TryOnResponse(
+                generated_image_url=image_url,
+                product_id=product_id,
+                generation_prompt=generation_prompt,
+                success=tryon is not None
+            ))
+        
+        logger.info(f"Generated {sum(r.success for r in results)}/{len(results)} batch virtual try-ons")
+        return BatchTryOnResponse(results=results)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in virtual_tryon_batch: {e}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Batch virtual try-on failed: {str(e)}"
+        )
+
 @router.post("/feedback", response_model=FeedbackResponse)
 async def process_feedback(request: FeedbackRequest, recommendation_service = Depends(get_recommendation_service)):
     """
@@ -277,14 +543,6 @@ async def process_feedback(request: FeedbackRequest, recommendation_service = De
     try:
         logger.info(f"Received feedback: {request.action} for product {request.product_id}")
         
-        # Validate action
-        valid_actions = ["like", "dislike", "save"]
-        if request.action not in valid_actions:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Invalid action. Must be one of: {valid_actions}"
-            )
-        
         # Process feedback
         if request.session_id:
             result = await recommendation_service.process_feedback(
@@ -315,7 +573,7 @@ async def process_feedback(request: FeedbackRequest, recommendation_service = De
             detail=f"Failed to process feedback: {str(e)}"
         )
 
-@router.post("/refresh", response_model=List[dict])
+@router.post("/refresh", response_model=List[ProductItem])
 async def refresh_recommendations(request: RefreshRequest, recommendation_service = Depends(get_recommendation_service)):
     """
     Get fresh recommendations to replace disliked items
@@ -332,8 +590,8 @@ async def refresh_recommendations(request: RefreshRequest, recommendation_servic
             count=request.count
         )
         
-        # Convert to dict format for response
-        return [item.dict() for item in fresh_items]
+        # Serialized straight to JSON bytes without FastAPI re-validating each item
+        return Response(content=_product_list_adapter.dump_json(fresh_items), media_type="application/json")
         
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -344,13 +602,94 @@ async def refresh_recommendations(request: RefreshRequest, recommendation_servic
             detail=f"Failed to refresh recommendations: {str(e)}"
         )
 
-@router.get("/debug/data", response_model=dict)
-async def debug_data_files():
-    """Debug endpoint to check data file status"""
+# Endpoints that can run inside /batch: name -> (request model, handler). Try-on is left
+# out on purpose, it is long-running and would hold up every other result in the batch.
+_BATCH_ENDPOINTS = {
+    "health": (None, health_check),
+    "recommendations": (RecommendationRequest, get_recommendations),
+    "recommendations/v2": (RecommendationRequest, get_recommendations_v2),
+    "feedback": (FeedbackRequest, process_feedback)
+}
+
+async def _run_batch_operation(
+    operation: BatchOperation,
+    recommendation_service: RecommendationService
+) -> BatchResult:
+    """Run one batched operation in-process, capturing errors as its status code"""
+    request_model, handler = _BATCH_ENDPOINTS[operation.endpoint]
+    try:
+        if request_model is None:
+            result = await handler(recommendation_service=recommendation_service)
+        else:
+            result = await handler(
+                request_model.model_validate(operation.body),
+                recommendation_service=recommendation_service
+            )
+        status_code = 200
+        body = json.loads(result.body) if isinstance(result, Response) else result.model_dump(mode="json")
+    except ValidationError as e:
+        status_code, body = 422, {"detail": json.loads(e.json(include_url=False))}
+    except HTTPException as e:
+        status_code, body = e.status_code, {"detail": e.detail}
+    except Exception as e:
+        logger.error(f"Batch operation {operation.endpoint} failed: {e}")
+        status_code, body = 500, {"detail": str(e)}
+
+    return BatchResult(id=operation.id, endpoint=operation.endpoint, status_code=status_code, body=body)
+
+@router.post("/batch", response_model=BatchResponse)
+async def batch(request: BatchRequest, recommendation_service = Depends(get_recommendation_service)):
+    """
+    Run several API operations in one round-trip
+    
+    Operations are dispatched in-process and run concurrently, so they must not depend on
+    each other (e.g. feedback on a session created by a recommendation in the same batch).
+    Each result carries the status code the standalone endpoint would have returned.
+    """
+    logger.info(f"Received batch of {len(request.operations)} operations")
+    results = await asyncio.gather(*(
+        _run_batch_operation(operation, recommendation_service) for operation in request.operations
+    ))
+    return BatchResponse(results=results)
+
+# Data file status is computed off the event loop at startup and refreshed in the background
+_debug_info: Optional[dict] = None
+
+# CSV path -> ((mtime_ns, size), (line_count, first_line)); recounted only when the file changes
+_csv_stat_cache: Dict[str, Tuple[Tuple[int, int], Tuple[int, Optional[str]]]] = {}
+
+def _csv_file_stats(path: str) -> Tuple[int, Optional[str]]:
+    """Line count and first line of a CSV, cached by modification time and size"""
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _csv_stat_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(path, 'rb') as f:
+        first_line = f.readline()
+        line_count = 1 if first_line else 0
+        last_chunk = first_line
+        # Count newlines in C over 1 MiB chunks instead of iterating lines in Python
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            line_count += chunk.count(b'\n')
+            last_chunk = chunk
+        if last_chunk is not first_line and not last_chunk.endswith(b'\n'):
+            line_count += 1  # Final line without a trailing newline
+
+    stats = (line_count, first_line.decode().strip() if first_line else None)
+    _csv_stat_cache[path] = (key, stats)
+    return stats
+
+def _compute_debug_info(rescan: bool = False) -> dict:
+    """Probe the data files (blocking I/O, run in a worker thread)"""
+    # The CSV location is resolved once at startup; only rescan on request
+    csv_path = resolve_styles_csv_path(rescan=rescan)
     debug_info = {
         "working_directory": os.getcwd(),
         "styles_csv_path": settings.styles_csv_path,
-        "styles_csv_exists": os.path.exists(settings.styles_csv_path),
+        "resolved_csv_path": csv_path,
+        "styles_csv_exists": csv_path == settings.styles_csv_path,
         "data_dir_exists": os.path.exists(settings.data_dir),
         "data_dir_contents": [],
         "csv_line_count": 0,
@@ -358,61 +697,67 @@ async def debug_data_files():
     }
     
     # Check data directory contents
-    if os.path.exists(settings.data_dir):
+    if debug_info["data_dir_exists"]:
         try:
             debug_info["data_dir_contents"] = os.listdir(settings.data_dir)
         except Exception as e:
             debug_info["data_dir_error"] = str(e)
     
     # Check CSV file details
-    if os.path.exists(settings.styles_csv_path):
+    if csv_path:
         try:
-            with open(settings.styles_csv_path, 'r') as f:
-                lines = f.readlines()
-                debug_info["csv_line_count"] = len(lines)
-                if lines:
-                    debug_info["csv_first_line"] = lines[0].strip()
+            line_count, first_line = _csv_file_stats(csv_path)
+            debug_info["csv_line_count"] = line_count
+            debug_info["csv_first_line"] = first_line
         except Exception as e:
             debug_info["csv_read_error"] = str(e)
     
     return debug_info
 
+async def refresh_debug_info(rescan: bool = False) -> dict:
+    """Recompute the data file status without blocking the event loop"""
+    global _debug_info
+    _debug_info = await asyncio.to_thread(_compute_debug_info, rescan)
+    return _debug_info
+
+async def refresh_debug_info_periodically(interval_sec: float) -> None:
+    """Keep the data file status fresh for /debug/data"""
+    while True:
+        try:
+            await refresh_debug_info()
+        except Exception as e:
+            logger.warning(f"Debug info refresh failed: {e}")
+        await asyncio.sleep(interval_sec)
+
+@router.get("/debug/data", response_model=dict)
+async def debug_data_files(rescan: bool = False):
+    """Debug endpoint to check data file status (?rescan=1 re-probes the CSV locations)"""
+    if _debug_info is None or rescan:
+        return await refresh_debug_info(rescan=rescan)
+    return _debug_info
+
 # Helper functions
-async def _get_product_by_id(product_id: str):
+
+# Product metadata is static, so lookups can be cached for hours
+_product_cache = TTLCache(max_items=8192, ttl_sec=3600)
+
+async def _get_product_by_id(product_id: str, recommendation_service: RecommendationService):
     """
     Get actual product details by ID from the vector store
     Enhanced to provide real product data for better virtual try-on accuracy
     """
+    cached_product = _product_cache.get(product_id)
+    if cached_product is not None:
+        return cached_product
+
     try:
-        # Get recommendation service instance
-        from app.services.recommendation_service import RecommendationService
-        from app.services.vector_service import VectorService
-        
-        vector_service = VectorService()
-        
-        # Search for the specific product by ID
-        # This searches through the actual product database
-        search_results = await vector_service.similarity_search(
-            query=f"product_id:{product_id}",
-            k=1,
-            filter_criteria={"id": product_id}
-        )
-        
-        if not search_results:
-            # Try searching by product ID in the metadata
-            search_results = await vector_service.similarity_search(
-                query=product_id,
-                k=1
-            )
+        # Look up the product directly in the loaded catalog metadata
+        product_data = recommendation_service.vector_service.get_by_id(product_id)
         
-        if search_results:
-            product_data = search_results[0]
-            
+        if product_data:
             # Convert to ProductItem format
-            from app.models.responses import ProductItem
-            
-            return ProductItem(
-                id=product_data.get("id", product_id),
+            product_item = ProductItem(
+                id=str(product_data.get("id", product_id)),
                 name=product_data.get("productDisplayName", f"Product {product_id}"),
                 category=product_data.get("masterCategory", "Fashion"),
                 subcategory=product_data.get("subCategory", "Clothing"),
@@ -423,6 +768,8 @@ async def _get_product_by_id(product_id: str):
                 image_url=f"{settings.github_images_base_url}/{product_id}.jpg",
                 similarity_score=1.0  # Exact match
             )
+            _product_cache.set(product_id, product_item)
+            return product_item
         else:
             logger.warning(f"Product {product_id} not found in vector store, using fallback")
             # Fallback to mock product if not found
@@ -1,17 +1,47 @@
 import os
-from typing import Optional
+from typing import Any, Dict, Optional
 from pydantic_settings import BaseSettings
 
+# Vector length each embedding model returns when no reduced size is requested
+NATIVE_EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536
+}
+
+# Headroom in the /recommendations/v2 budget for building complete looks after ranking
+COMPLETE_LOOK_HEADROOM_SECONDS = 10.0
+
 class Settings(BaseSettings):
     # OpenAI Configuration
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     gpt_model: str = "gpt-4o-mini"
-    embedding_model: str = "text-embedding-3-large"
-    embedding_cost_per_1k_tokens: float = 0.00013
+    embedding_model: str = "text-embedding-3-small"
+    embedding_dimensions: Optional[int] = 512  # Reduced vector size (text-embedding-3 only); None for native
+    embedding_cost_per_1k_tokens: float = 0.00002
+    openai_batch_max_wait_ms: int = 10
+    openai_batch_max_size: int = 32
+    embedding_chunk_size: int = 512  # Inputs per embeddings request (API cap is 2048)
+    embedding_concurrency: int = 8  # Initial embeddings requests in flight; adapted between 1 and the max
+    embedding_concurrency_max: int = 32
+    embedding_latency_target_seconds: float = 3.0  # Concurrency backs off when requests average slower
+    embedding_cache_ttl_seconds: int = 86400
+    embedding_cache_max_items: int = 10000  # In-process LRU entries (float32, ~2KB each at 512 dims)
+    chat_history_token_budget: int = 2000
+    query_enhancement_enabled: bool = False  # GPT query rewrites, computed off the request path
+    rerank_min_items: int = 10  # Lists this short keep their vector-search order
+    rerank_max_items: int = 60  # Longer lists would overflow the ranking reply; they keep vector order
+    openai_http_max_connections: int = 100
+    openai_timeout_seconds: float = 60.0  # Per OpenAI request; the SDK default is 10 minutes
+    openai_connect_timeout_seconds: float = 5.0
+    openai_rpm_limit: Optional[int] = None  # Client-side requests-per-minute cap across all OpenAI calls
+    openai_throttle_max_wait_seconds: float = 5.0  # Longest a request is held by rate-limit throttling
     
     # Application Configuration
     environment: str = os.getenv("ENVIRONMENT", "production")
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    log_format: str = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+    log_queue_enabled: bool = True  # Write logs from a background thread
     
     # External URLs
     github_images_base_url: str = "https://raw.githubusercontent.com/openai/openai-cookbook/main/examples/data/sample_clothes/sample_images"
@@ -19,8 +49,10 @@ class Settings(BaseSettings):
     # Data Configuration (Vercel deployment paths)
     data_dir: str = "data"
     styles_csv_path: str = "data/sample_styles.csv"
+    resolved_csv_path: Optional[str] = None  # Set at startup by resolve_styles_csv_path()
     embeddings_csv_path: str = "data/sample_styles_with_embeddings.csv"
     faiss_index_path: str = "data/clothing.index"
+    faiss_index_mmap: bool = True  # Map the index read-only so workers share page cache
     metadata_path: str = "data/metadata.pkl"
     store_location_path: str = "data/storeLocationMap.json"
     
@@ -28,11 +60,75 @@ class Settings(BaseSettings):
     similarity_threshold: float = 0.7
     max_search_results: int = 100
     default_top_k: int = 20
-    
+
+    # Semantic Cache Configuration
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.93
+    semantic_cache_ttl_seconds: int = 300
+    semantic_cache_max_items: int = 4096
+    semantic_cache_max_items_per_scope: int = 64  # Bounds the similarity scan per lookup
+    ranking_cache_threshold: float = 0.97  # GPT rankings need a closer prompt match than whole responses
+
+    # Session Configuration
+    session_ttl_seconds: int = 7200
+    session_max_items: int = 50000
+    redis_url: Optional[str] = os.getenv("REDIS_URL")  # Shared session store when set
+    redis_max_connections: int = 50
+
+    # Debug Configuration
+    debug_info_refresh_seconds: int = 60
+
+    # Middleware Configuration
+    single_flight_enabled: bool = True
+    micro_cache_ttl_seconds: float = 2.0  # 0 disables the micro cache
+    # Request budgets; None derives them from the OpenAI timeouts so slow but healthy calls finish
+    recommendation_timeout_seconds: Optional[float] = None
+    recommendation_v2_timeout_seconds: Optional[float] = None
+    batch_timeout_seconds: Optional[float] = None
+    tryon_timeout_seconds: float = 60.0
+
     # API Configuration
     api_prefix: str = "/api/v1"
     cors_origins: list = ["*"]  # Update for production
     
+    @property
+    def embedding_dimension(self) -> int:
+        """Length of the vectors returned for the configured embedding model"""
+        return self.embedding_dimensions or NATIVE_EMBEDDING_DIMENSIONS.get(self.embedding_model, 1536)
+
+    @property
+    def embedding_options(self) -> Dict[str, Any]:
+        """Model arguments for embeddings.create"""
+        if self.embedding_dimensions:
+            return {"model": self.embedding_model, "dimensions": self.embedding_dimensions}
+        return {"model": self.embedding_model}
+
+    @property
+    def openai_call_budget_seconds(self) -> float:
+        """Longest one OpenAI request can take: rate-limit throttling, connect and read timeouts"""
+        return self.openai_throttle_max_wait_seconds + self.openai_connect_timeout_seconds + self.openai_timeout_seconds
+
+    @property
+    def recommendation_budget_seconds(self) -> float:
+        """Budget for /recommendations: the query embedding, then the ranking call"""
+        if self.recommendation_timeout_seconds is not None:
+            return self.recommendation_timeout_seconds
+        return 2 * self.openai_call_budget_seconds
+
+    @property
+    def recommendation_v2_budget_seconds(self) -> float:
+        """Budget for /recommendations/v2: categories are searched and ranked concurrently, then completed"""
+        if self.recommendation_v2_timeout_seconds is not None:
+            return self.recommendation_v2_timeout_seconds
+        return 2 * self.openai_call_budget_seconds + COMPLETE_LOOK_HEADROOM_SECONDS
+
+    @property
+    def batch_budget_seconds(self) -> float:
+        """Budget for /batch: operations run concurrently, so the slowest endpoint it allows bounds it"""
+        if self.batch_timeout_seconds is not None:
+            return self.batch_timeout_seconds
+        return max(self.recommendation_budget_seconds, self.recommendation_v2_budget_seconds)
+
     class Config:
         env_file = ".env"
         case_sensitive = False
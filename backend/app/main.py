@@ -1,12 +1,27 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import time
-import uuid
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
+from contextlib import asynccontextmanager
 import asyncio
+import json
+from typing import Any, Dict, Optional
 from app.config import settings
-from app.utils.logging import setup_logging, get_logger
-from app.models.responses import ErrorResponse
+from app.middleware.etag import ETagMiddleware
+from app.middleware.micro_cache import MicroCacheMiddleware
+from app.middleware.request_logging import LoggingMiddleware
+from app.middleware.single_flight import SingleFlightMiddleware
+from app.middleware.startup_hook import StartupHookMiddleware
+from app.middleware.timeout import TimeoutMiddleware
+from app.utils.http_client import close_http_client
+from app.utils.logging import setup_logging, get_logger, request_id_var
+
+# Optional fast JSON encoder for error bodies
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Setup logging
 setup_logging()
@@ -14,47 +29,101 @@ logger = get_logger(__name__)
 
 # Global service instance
 recommendation_service = None
-_service_lock = asyncio.Lock()
+# Set once the in-flight initialization finishes; created lazily so it binds to the running loop
+_service_ready: Optional[asyncio.Event] = None
 
 async def get_or_create_recommendation_service():
     """Lazy initialization of recommendation service"""
-    global recommendation_service
+    global recommendation_service, _service_ready
     
     if recommendation_service is not None:
         return recommendation_service
     
-    async with _service_lock:
-        # Double-check pattern
-        if recommendation_service is not None:
-            return recommendation_service
+    # Another caller is already initializing, wait for its result
+    if _service_ready is not None:
+        await _service_ready.wait()
+        return recommendation_service
+    
+    _service_ready = asyncio.Event()
+    logger.info("Initializing recommendation service (lazy)...")
+    try:
+        from app.services.recommendation_service import RecommendationService
+        service = RecommendationService()
         
-        logger.info("Initializing recommendation service (lazy)...")
-        try:
-            from app.services.recommendation_service import RecommendationService
-            service = RecommendationService()
+        # Initialize the service
+        success = await service.initialize()
+        if not success:
+            logger.error("Failed to initialize recommendation service")
+        else:
+            logger.info("Recommendation service initialized successfully")
+            # Log service status
+            status = service.get_service_status()
+            logger.info(f"Service status: {status}")
             
-            # Initialize the service
-            success = await service.initialize()
-            if not success:
-                logger.error("Failed to initialize recommendation service")
-                return None
-            else:
-                logger.info("Recommendation service initialized successfully")
-                # Log service status
-                status = service.get_service_status()
-                logger.info(f"Service status: {status}")
-                
-                recommendation_service = service
-                return recommendation_service
-                
-        except Exception as e:
-            logger.error(f"Error initializing recommendation service: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return None
+            recommendation_service = service
+            
+    except Exception as e:
+        logger.error(f"Error initializing recommendation service: {e}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+    finally:
+        ready = _service_ready
+        if recommendation_service is None:
+            _service_ready = None  # Let a later call retry after a failure
+        ready.set()
+    
+    return recommendation_service
+
+_api_routes_included = False
+
+def include_api_routes() -> None:
+    """
+    Import and mount the API router
+    Deferred until startup because the routes pull in the OpenAI, numpy and FAISS service stack
+    """
+    global _api_routes_included
+    if _api_routes_included:
+        return
+    _api_routes_included = True
+    try:
+        from app.api.routes import router
+        app.include_router(router, prefix=settings.api_prefix)
+        logger.info("Included main API router")
+    except Exception as e:
+        logger.error(f"Error including main API router: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize the recommendation service once at startup and release shared clients on shutdown"""
+    include_api_routes()
+    from app.api.routes import set_recommendation_service, refresh_debug_info_periodically
+    service = await get_or_create_recommendation_service()
+    if service is not None:
+        set_recommendation_service(service)
+    
+    # Preload data file status for /debug/data and keep it fresh in the background
+    debug_refresh_task = asyncio.create_task(
+        refresh_debug_info_periodically(settings.debug_info_refresh_seconds)
+    )
+    yield
+    debug_refresh_task.cancel()
+    if service is not None:
+        await service.session_store.close()
+        await service.openai_service.embedding_cache.close()
+    await close_http_client()
+
+# Static service information served at /
+ROOT_INFO = {
+    "service": "Ray AI Shopper Backend",
+    "version": "1.0.0",
+    "status": "running",
+    "docs": "/docs",
+    "api_prefix": settings.api_prefix
+}
 
 # Create FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
     title="Ray AI Shopper Backend",
     description="AI-powered fashion recommendation service using GPT-4o mini and RAG",
     version="1.0.0",
@@ -62,55 +131,84 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
-# Add CORS middleware
+# Mount the API routes on the first request when the runtime skips lifespan events
+app.add_middleware(StartupHookMiddleware, hook=include_api_routes)
+
+# Serve near-static endpoints polled by health checks from a short-lived cache
+if settings.micro_cache_ttl_seconds > 0:
+    app.add_middleware(
+        MicroCacheMiddleware,
+        paths=[f"{settings.api_prefix}/health", f"{settings.api_prefix}/debug/data"],
+        ttl_sec=settings.micro_cache_ttl_seconds
+    )
+
+# Coalesce identical concurrent requests (inside CORS and GZip, so the shared response is
+# recorded before per-request CORS headers and compression are applied)
+if settings.single_flight_enabled:
+    app.add_middleware(
+        SingleFlightMiddleware,
+        post_paths=[f"{settings.api_prefix}/recommendations/v2"]
+    )
+
+# Weak ETags let pollers revalidate unchanged GET responses with a bodiless 304
+app.add_middleware(ETagMiddleware)
+
+# Shed requests that overrun their budget instead of letting slow upstream calls pile up
+app.add_middleware(
+    TimeoutMiddleware,
+    budgets={
+        f"{settings.api_prefix}/recommendations": settings.recommendation_budget_seconds,
+        f"{settings.api_prefix}/recommendations/v2": settings.recommendation_v2_budget_seconds,
+        f"{settings.api_prefix}/batch": settings.batch_budget_seconds,
+        f"{settings.api_prefix}/tryon": settings.tryon_timeout_seconds,
+        f"{settings.api_prefix}/tryon/batch": settings.tryon_timeout_seconds
+    }
+)
+
+# Add CORS middleware (explicit methods/headers so preflight responses are precomputed
+# instead of reflecting the requested headers back on every OPTIONS)
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.cors_origins,
+    allow_origins=frozenset(settings.cors_origins),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=("GET", "HEAD", "POST", "OPTIONS"),
+    allow_headers=("content-type", "authorization", "x-request-id", "if-none-match"),
+    expose_headers=("X-Request-ID", "ETag"),
 )
 
-# Request logging middleware
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all incoming requests"""
-    request_id = str(uuid.uuid4())
-    start_time = time.time()
-    
-    logger.info(
-        f"Request {request_id}: {request.method} {request.url.path} "
-        f"from {request.client.host if request.client else 'unknown'}"
-    )
-    
-    # Add request ID to request state
-    request.state.request_id = request_id
-    
-    try:
-        response = await call_next(request)
-        process_time = time.time() - start_time
-        
-        logger.info(
-            f"Request {request_id} completed in {process_time:.3f}s "
-            f"with status {response.status_code}"
-        )
-        
-        # Add request ID to response headers for debugging
-        response.headers["X-Request-ID"] = request_id
-        return response
-        
-    except Exception as e:
-        process_time = time.time() - start_time
-        logger.error(
-            f"Request {request_id} failed after {process_time:.3f}s: {str(e)}"
+# Compress larger JSON payloads (recommendation lists, refresh batches)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
+# Request logging middleware (outermost, so every response carries X-Request-ID).
+# Load balancer probes of / are answered here from the pre-encoded service info.
+app.add_middleware(LoggingMiddleware, probe_responses={"/": json.dumps(ROOT_INFO, separators=(",", ":")).encode()})
+
+def _error_response(
+    status_code: int,
+    error: str,
+    message: Any,
+    details: Optional[Dict[str, Any]],
+    request_id: str,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Encode an ErrorResponse-shaped body directly, skipping pydantic model construction
+    """
+    payload = {"error": error, "message": message, "details": details, "request_id": request_id}
+    if ORJSON_AVAILABLE:
+        return Response(
+            content=orjson.dumps(payload, default=str),
+            status_code=status_code,
+            headers=headers,
+            media_type="application/json"
         )
-        raise
+    return JSONResponse(status_code=status_code, content=payload, headers=headers)
 
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Handle all unhandled exceptions"""
-    request_id = getattr(request.state, 'request_id', 'unknown')
+    request_id = request_id_var.get()
     
     logger.error(f"Unhandled exception in request {request_id}: {str(exc)}")
     
@@ -122,51 +220,29 @@ async def global_exception_handler(request: Request, exc: Exception):
         error_message = str(exc)
         error_details = {"type": type(exc).__name__}
     
-    return JSONResponse(
-        status_code=500,
-        content=ErrorResponse(
-            error="internal_server_error",
-            message=error_message,
-            details=error_details,
-            request_id=request_id
-        ).dict()
-    )
+    return _error_response(500, "internal_server_error", error_message, error_details, request_id)
 
 # HTTP exception handler
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """Handle HTTP exceptions with consistent error format"""
-    request_id = getattr(request.state, 'request_id', 'unknown')
+    request_id = request_id_var.get()
     
-    return JSONResponse(
-        status_code=exc.status_code,
-        content=ErrorResponse(
-            error="http_error",
-            message=exc.detail,
-            details={"status_code": exc.status_code},
-            request_id=request_id
-        ).dict()
+    return _error_response(
+        exc.status_code,
+        "http_error",
+        exc.detail,
+        {"status_code": exc.status_code},
+        request_id,
+        headers=exc.headers
     )
 
-# Include API routes
-try:
-    from app.api.routes import router
-    app.include_router(router, prefix=settings.api_prefix)
-    logger.info("Included main API router")
-except Exception as e:
-    logger.error(f"Error including main API router: {e}")
 
 # Root endpoint
 @app.get("/")
 async def root():
     """Root endpoint with service information"""
-    return {
-        "service": "Ray AI Shopper Backend",
-        "version": "1.0.0",
-        "status": "running",
-        "docs": "/docs",
-        "api_prefix": settings.api_prefix
-    }
+    return ROOT_INFO
 
 # Debug endpoint to test service availability
 @app.get("/debug/service")
@@ -186,10 +262,6 @@ def get_recommendation_service():
     logger.info(f"get_recommendation_service called, service is: {recommendation_service}")
     return recommendation_service
 
-async def get_recommendation_service_async():
-    """Async version that creates service if needed"""
-    return await get_or_create_recommendation_service()
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
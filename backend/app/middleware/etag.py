@@ -0,0 +1,75 @@
+import hashlib
+from typing import List, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+class ETagMiddleware:
+    """
+    Add weak ETags to successful GET responses and answer matching If-None-Match with 304
+    Clients re-polling unchanged state skip the payload transfer entirely.
+    Responses that set cookies or already carry an ETag are passed through untouched.
+    HEAD is passed through too: its empty body would hash to a different tag than the GET representation.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = self._header(scope["headers"], b"if-none-match")
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def etag_send(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                if message["status"] != 200 or any(
+                    name.lower() in (b"set-cookie", b"etag") for name, _ in headers
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            etag = b'W/"' + hashlib.blake2b(body, digest_size=8).hexdigest().encode() + b'"'
+
+            if if_none_match is not None and self._matches(if_none_match, etag):
+                await send({"type": "http.response.start", "status": 304, "headers": [(b"etag", etag)]})
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+
+            await send({**start, "headers": [*start.get("headers", []), (b"etag", etag)]})
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
+        await self.app(scope, receive, etag_send)
+
+    @staticmethod
+    def _header(headers: List, name: bytes) -> Optional[bytes]:
+        for key, value in headers:
+            if key == name:
+                return value
+        return None
+
+    @staticmethod
+    def _matches(if_none_match: bytes, etag: bytes) -> bool:
+        # Weak comparison: W/ prefixes are ignored on both sides
+        opaque = etag[2:]
+        for candidate in if_none_match.split(b","):
+            candidate = candidate.strip()
+            if candidate == b"*" or candidate.removeprefix(b"W/") == opaque:
+                return True
+        return False
@@ -0,0 +1,60 @@
+import time
+from typing import Dict, Iterable, List, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# (expires_at, status, headers, body) recorded from the last successful response
+CachedResponse = Tuple[float, int, List[Tuple[bytes, bytes]], bytes]
+
+class MicroCacheMiddleware:
+    """
+    Cache near-static GET responses for a few seconds
+    Health checks and dashboards polling the whitelisted paths are served from memory
+    instead of running the handler on every hit. Entries expire lazily on read.
+    """
+
+    def __init__(self, app: ASGIApp, paths: Iterable[str] = (), ttl_sec: float = 2.0):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.ttl_sec = ttl_sec
+        self._cache: Dict[Tuple[str, str, bytes], CachedResponse] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or scope["path"] not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["method"], scope["path"], scope["query_string"])
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _, status, headers, body = entry
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+            return
+
+        status = 500
+        headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+
+        async def recording_send(message: Message) -> None:
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive, recording_send)
+
+        # Only successful responses are worth replaying
+        if status == 200:
+            self._cache[key] = (time.monotonic() + self.ttl_sec, status, headers, b"".join(chunks))
+        else:
+            self._cache.pop(key, None)
@@ -0,0 +1,96 @@
+import itertools
+import secrets
+import time
+from typing import Dict, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.utils.logging import get_logger, request_id_var
+
+logger = get_logger(__name__)
+
+# Request IDs: per-process nonce plus a counter, cheaper than a uuid4 per request
+_process_nonce = secrets.token_hex(4)
+_request_counter = itertools.count()
+
+def next_request_id() -> str:
+    return f"{_process_nonce}-{next(_request_counter):x}"
+
+class LoggingMiddleware:
+    """
+    Pure ASGI request logging middleware
+    Tags each request with an ID (request.state.request_id and X-Request-ID) and logs its outcome
+    GET/HEAD probes to the paths in probe_responses are answered directly from pre-encoded JSON,
+    skipping the ID, logging and the rest of the stack.
+    """
+
+    def __init__(self, app: ASGIApp, probe_responses: Optional[Dict[str, bytes]] = None):
+        self.app = app
+        self.probe_responses = {
+            path: (
+                [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-request-id", b"probe")
+                ],
+                body
+            )
+            for path, body in (probe_responses or {}).items()
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        probe = self.probe_responses.get(scope["path"])
+        if probe is not None and scope["method"] in ("GET", "HEAD"):
+            headers, body = probe
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({
+                "type": "http.response.body",
+                "body": body if scope["method"] == "GET" else b"",
+                "more_body": False
+            })
+            return
+
+        request_id = next_request_id()
+        start_ns = time.perf_counter_ns()
+        status_code = 500
+
+        # Exposed to handlers as request_id_var (and request.state.request_id), and stamped on log records
+        scope.setdefault("state", {})["request_id"] = request_id
+        token = request_id_var.set(request_id)
+
+        # Lazy %-formatting plus structured extras: nothing is formatted when INFO is filtered out
+        client = scope.get("client")
+        client_host = client[0] if client else "unknown"
+        logger.info(
+            "Request %s: %s %s from %s", request_id, scope["method"], scope["path"], client_host,
+            extra={"method": scope["method"], "path": scope["path"], "client": client_host}
+        )
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Add request ID to response headers for debugging
+                message.setdefault("headers", []).append((b"x-request-id", request_id.encode()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except Exception as e:
+            dur_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+            logger.error(
+                "Request %s failed after %dms: %s", request_id, dur_ms, e,
+                extra={"status": 500, "dur_ms": dur_ms}
+            )
+            # Left bound so the server error handler, which runs outside this middleware, can report it
+            raise
+
+        # Monotonic integer clock: immune to wall-clock adjustments, no float formatting
+        dur_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+        logger.info(
+            "Request %s completed in %dms with status %s", request_id, dur_ms, status_code,
+            extra={"status": status_code, "dur_ms": dur_ms}
+        )
+        request_id_var.reset(token)
@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.middleware.streaming import stream_requested
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# (status, headers, body) recorded from the leading request
+RecordedResponse = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+class SingleFlightMiddleware:
+    """
+    Coalesce identical concurrent requests into one execution
+    The first request runs normally while duplicates wait for it and replay its response.
+    Only GET/HEAD requests and POSTs to the given idempotent paths are coalesced; POSTs only
+    when their body names a session, since the handler otherwise mints a fresh session id that
+    must not be replayed to other clients.
+    """
+
+    def __init__(self, app: ASGIApp, post_paths: Iterable[str] = ()):
+        self.app = app
+        self.post_paths = frozenset(post_paths)
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+
+    def _is_coalescable(self, scope: Scope) -> bool:
+        method = scope["method"]
+        if method in ("GET", "HEAD"):
+            return True
+        # Streaming responses are produced progressively, so never share them
+        return method == "POST" and scope["path"] in self.post_paths and not stream_requested(scope)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._is_coalescable(scope):
+            await self.app(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        body_consumed = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_consumed
+            if not body_consumed:
+                body_consumed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        if scope["method"] == "POST" and not self._names_session(body):
+            await self.app(scope, replay_receive, send)
+            return
+
+        key = hashlib.blake2b(
+            b"\0".join([scope["method"].encode(), scope["path"].encode(), scope["query_string"], body]),
+            digest_size=16
+        ).digest()
+
+        leader = self._inflight.get(key)
+        if leader is not None:
+            recorded = await asyncio.shield(leader)
+            if recorded is not None:
+                await self._replay(recorded, send)
+                return
+            # The leading request failed, run this one on its own
+            await self.app(scope, replay_receive, send)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        status = 500
+        headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+
+        async def recording_send(message: Message) -> None:
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        recorded: Optional[RecordedResponse] = None
+        try:
+            await self.app(scope, replay_receive, recording_send)
+            recorded = (status, headers, b"".join(chunks))
+        finally:
+            del self._inflight[key]
+            future.set_result(recorded)
+
+    @staticmethod
+    def _names_session(body: bytes) -> bool:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return False
+        return isinstance(payload, dict) and bool(payload.get("session_id"))
+
+    @staticmethod
+    async def _read_body(receive: Receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                return b"".join(chunks)
+
+    @staticmethod
+    async def _replay(recorded: RecordedResponse, send: Send) -> None:
+        status, headers, body = recorded
+        await send({"type": "http.response.start", "status": status, "headers": list(headers)})
+        await send({"type": "http.response.body", "body": body, "more_body": False})
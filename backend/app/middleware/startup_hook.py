@@ -0,0 +1,20 @@
+from typing import Callable
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+class StartupHookMiddleware:
+    """
+    Run a one-off setup hook before the first request is routed
+    Covers runtimes that never send ASGI lifespan events (e.g. serverless), where work
+    normally done at startup would otherwise be skipped. The hook must be idempotent.
+    """
+
+    def __init__(self, app: ASGIApp, hook: Callable[[], None]):
+        self.app = app
+        self.hook = hook
+        self._done = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self._done and scope["type"] in ("http", "websocket"):
+            self._done = True
+            self.hook()
+        await self.app(scope, receive, send)
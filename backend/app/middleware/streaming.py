@@ -0,0 +1,17 @@
+from urllib.parse import parse_qsl
+from starlette.types import Scope
+
+# Strings pydantic accepts as True for a `stream: bool` query parameter (compared lowercased)
+_TRUE_VALUES = frozenset({"1", "on", "t", "true", "y", "yes"})
+
+def stream_requested(scope: Scope) -> bool:
+    """
+    Whether the request asks for a streamed response via ?stream=...
+    Parsed the way Starlette and FastAPI do: the last value wins and only truthy values count,
+    so ?stream=false or other parameters that merely contain "stream" are buffered requests
+    """
+    values = [
+        value for name, value in parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+        if name == "stream"
+    ]
+    return bool(values) and values[-1].lower() in _TRUE_VALUES
@@ -0,0 +1,65 @@
+import asyncio
+import json
+from typing import Dict, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.middleware.streaming import stream_requested
+from app.utils.logging import get_logger, request_id_var
+
+logger = get_logger(__name__)
+
+class TimeoutMiddleware:
+    """
+    Bound how long a request may run before it is shed with a 503
+    Budgets are per path so slow endpoints (try-on image generation) get more room than
+    interactive ones. Paths without a budget, and streamed responses, are not limited.
+    """
+
+    def __init__(self, app: ASGIApp, budgets: Dict[str, float]):
+        self.app = app
+        self.budgets = dict(budgets)
+
+    def _budget_for(self, scope: Scope) -> Optional[float]:
+        # Streamed responses legitimately run long and can't be replaced once started
+        if stream_requested(scope):
+            return None
+        return self.budgets.get(scope["path"])
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        budget = self._budget_for(scope) if scope["type"] == "http" else None
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await asyncio.wait_for(self.app(scope, receive, tracking_send), timeout=budget)
+        except asyncio.TimeoutError:
+            request_id = request_id_var.get()
+            logger.warning(f"Request {request_id} to {scope['path']} exceeded its {budget}s budget")
+            if response_started:
+                # Headers are already on the wire, all we can do is end the body
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+            body = json.dumps({
+                "error": "timeout",
+                "message": f"Request exceeded its {budget:g}s time budget",
+                "details": None,
+                "request_id": request_id
+            }).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", b"1")
+                ]
+            })
+            await send({"type": "http.response.body", "body": body, "more_body": False})
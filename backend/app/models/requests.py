@@ -1,7 +1,13 @@
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Dict, Any
+from pydantic import BaseModel, Field, field_validator
 from enum import Enum
 
+VALID_FEEDBACK_ACTIONS = frozenset({"like", "dislike", "save"})
+MAX_RESULTS_PER_REQUEST = 50
+DEFAULT_RESULTS_PER_REQUEST = 20
+MAX_BATCH_OPERATIONS = 10
+MAX_TRYON_PRODUCTS = 5
+
 class Gender(str, Enum):
     MEN = "Men"
     WOMEN = "Women"
@@ -35,12 +41,24 @@ class FilterOptions(BaseModel):
 
 class RecommendationRequest(BaseModel):
     user_profile: UserProfile
-    inspiration_images: List[str] = Field(default=[], description="Base64 encoded inspiration images")
+    inspiration_images: List[str] = Field(default=[], description="Inspiration images as URLs or base64 encoded data")
     filters: Optional[FilterOptions] = None
     top_k: int = Field(default=20, description="Number of recommendations to return")
     items_per_category: Optional[int] = Field(None, description="Number of items to return per article type category")
     session_id: Optional[str] = Field(None, description="Session identifier for tracking")
 
+    @field_validator("top_k", "items_per_category")
+    @classmethod
+    def clamp_result_count(cls, value: Optional[int]) -> Optional[int]:
+        """Clamp result counts to a reasonable range instead of rejecting the request"""
+        if value is None:
+            return value
+        if value > MAX_RESULTS_PER_REQUEST:
+            return MAX_RESULTS_PER_REQUEST
+        if value < 1:
+            return DEFAULT_RESULTS_PER_REQUEST
+        return value
+
 class ChatMessage(BaseModel):
     role: str = Field(..., description="Message role: 'user' or 'assistant'")
     content: str = Field(..., description="Message content")
@@ -57,6 +75,17 @@ class TryOnRequest(BaseModel):
     product_id: str = Field(..., description="Product ID to try on")
     product_image_url: Optional[str] = Field(None, description="Product image URL")
     style_prompt: Optional[str] = Field(None, description="Style instructions for DALL-E")
+    hd: bool = Field(False, description="Generate at HD quality (slower and about twice the cost)")
+
+class BatchTryOnRequest(BaseModel):
+    user_image: str = Field(..., description="Base64 encoded user selfie")
+    product_ids: List[str] = Field(
+        ..., min_length=1, max_length=MAX_TRYON_PRODUCTS,
+        description="Product IDs to try on, generated concurrently"
+    )
+    style_prompt: Optional[str] = Field(None, description="Style instructions for DALL-E")
+    hd: bool = Field(False, description="Generate at HD quality (slower and about twice the cost)")
+    grid: bool = Field(False, description="Render 2-4 products as panels of one image with a single generation")
 
 class FeedbackRequest(BaseModel):
     product_id: str = Field(..., description="Product ID for feedback")
@@ -64,7 +93,27 @@ class FeedbackRequest(BaseModel):
     session_id: Optional[str] = Field(None, description="Session identifier")
     reason: Optional[str] = Field(None, description="Reason for feedback")
 
+    @field_validator("action")
+    @classmethod
+    def validate_action(cls, value: str) -> str:
+        if value not in VALID_FEEDBACK_ACTIONS:
+            raise ValueError(f"Invalid action. Must be one of: {sorted(VALID_FEEDBACK_ACTIONS)}")
+        return value
+
 class RefreshRequest(BaseModel):
     session_id: str = Field(..., description="Session identifier")
     exclude_ids: List[str] = Field(..., description="Product IDs to exclude")
-    count: int = Field(default=1, description="Number of new items to fetch") 
\ No newline at end of file
+    count: int = Field(default=1, description="Number of new items to fetch")
+
+class BatchOperation(BaseModel):
+    id: Optional[str] = Field(None, description="Client identifier echoed back in the result")
+    endpoint: Literal["health", "recommendations", "recommendations/v2", "feedback"] = Field(
+        ..., description="API endpoint to run, relative to the API prefix"
+    )
+    body: Dict[str, Any] = Field(default_factory=dict, description="Request body for the endpoint")
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_OPERATIONS,
+        description="Operations to run concurrently in one round-trip"
+    )
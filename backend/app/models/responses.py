@@ -1,5 +1,5 @@
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 class ProductItemSummary(BaseModel):
     """Simplified product item for complete look suggestions to avoid circular references"""
@@ -17,6 +17,9 @@ class CompleteTheLookSuggestion(BaseModel):
     style_rationale: Optional[str] = Field(None, description="Why these items work together")
 
 class ProductItem(BaseModel):
+    # Built in bulk per request and never mutated; updates go through model_copy()
+    model_config = ConfigDict(frozen=True, extra="ignore", validate_assignment=False)
+
     id: str = Field(..., description="Product ID")
     name: str = Field(..., description="Product display name")
     category: str = Field(..., description="Product category")
@@ -31,9 +34,6 @@ class ProductItem(BaseModel):
     store_location: Optional[str] = Field(None, description="Store location")
     complete_the_look: Optional[CompleteTheLookSuggestion] = Field(None, description="Pre-computed complete look suggestions")
 
-# Update the ProductItem model to resolve the forward reference
-ProductItem.model_rebuild()
-
 class RecommendationResponse(BaseModel):
     recommendations: List[ProductItem] = Field(..., description="List of recommended products")
     total_available: int = Field(..., description="Total number of available recommendations")
@@ -52,6 +52,10 @@ class TryOnResponse(BaseModel):
     generation_prompt: str = Field(..., description="The prompt used for DALL-E generation")
     success: bool = Field(default=True, description="Whether generation was successful")
 
+class BatchTryOnResponse(BaseModel):
+    results: List[TryOnResponse] = Field(..., description="Try-on results in the same order as the product IDs")
+    grid_image_url: Optional[str] = Field(None, description="Single image with one panel per product, in request order, when a grid was generated")
+
 class FeedbackResponse(BaseModel):
     success: bool = Field(..., description="Whether feedback was processed successfully")
     message: str = Field(..., description="Response message")
@@ -75,6 +79,8 @@ class ErrorResponse(BaseModel):
 
 # V2 Response Models for improved recommendation system
 class CategoryResult(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore", validate_assignment=False)
+
     items: List[ProductItem] = Field(..., description="List of products in this category")
     total_available: int = Field(..., description="Total number of items found for this category")
     requested_count: int = Field(..., description="Number of items requested for this category")
@@ -89,8 +95,19 @@ class DebugInfo(BaseModel):
     processing_time_ms: int = Field(..., description="Total processing time in milliseconds")
 
 class RecommendationResponseV2(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore", validate_assignment=False)
+
     success: bool = Field(..., description="Whether the request was successful")
     error: Optional[str] = Field(None, description="Error message if request failed")
     categories: Dict[str, CategoryResult] = Field(..., description="Results organized by category")
     session_id: str = Field(..., description="Session identifier for tracking")
-    debug_info: Optional[DebugInfo] = Field(None, description="Debug information for development") 
\ No newline at end of file
+    debug_info: Optional[DebugInfo] = Field(None, description="Debug information for development")
+
+class BatchResult(BaseModel):
+    id: Optional[str] = Field(None, description="Client identifier from the operation")
+    endpoint: str = Field(..., description="Endpoint that was run")
+    status_code: int = Field(..., description="HTTP status the endpoint would have returned")
+    body: Any = Field(None, description="Endpoint response body, or error detail")
+
+class BatchResponse(BaseModel):
+    results: List[BatchResult] = Field(..., description="Results in the same order as the operations")
@@ -1,11 +1,67 @@
+import heapq
+import operator
 import time
 from typing import List, Dict, Optional, Tuple
 from app.models.responses import ProductItem, ProductItemSummary, CompleteTheLookSuggestion
 from app.models.requests import UserProfile
 from app.utils.logging import get_logger
 
+# Optional numpy for vectorized candidate scoring - graceful fallback to the per-item path
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 logger = get_logger(__name__)
 
+# Style group ids shared by compatible usages; any other usage only matches itself
+CASUAL_STYLE_GROUP = 0
+FORMAL_STYLE_GROUP = 1
+CASUAL_STYLES = frozenset(('casual', 'sports', 'home', 'travel'))
+FORMAL_STYLES = frozenset(('formal', 'party', 'ethnic'))
+STYLE_GROUPS = {
+    **{usage: CASUAL_STYLE_GROUP for usage in CASUAL_STYLES},
+    **{usage: FORMAL_STYLE_GROUP for usage in FORMAL_STYLES}
+}
+
+# Style rationale phrases: color bucket (white, black, other with suggestions) and usage bucket
+RATIONALE_COLOR_PHRASES = {
+    0: "White {article} pairs beautifully with any color",
+    1: "Black {article} creates a versatile foundation",
+    2: "{color} {article} complements {suggested}"
+}
+RATIONALE_COLOR_BUCKETS = {'White': 0, 'Black': 1}
+RATIONALE_STYLE_PHRASES = {
+    0: "Perfect for a relaxed, comfortable look",
+    1: "Ideal for a polished, sophisticated appearance"
+}
+RATIONALE_STYLE_BUCKETS = {'casual': 0, 'sports': 0, 'formal': 1, 'party': 1}
+RATIONALE_FALLBACK = "These pieces create a cohesive look with your {article}"
+
+class CategoryCache:
+    """
+    Struct-of-arrays view of one category's candidates, built once per request for vectorized scoring
+    """
+
+    def __init__(
+        self,
+        items: List[ProductItem],
+        color_ids: "np.ndarray",
+        raw_color_codes: "np.ndarray",
+        style_ids: "np.ndarray",
+        similarity: "np.ndarray"
+    ):
+        self.items = items
+        self.color_ids = color_ids
+        self.raw_color_codes = raw_color_codes
+        self.style_ids = style_ids
+        self.similarity = similarity
+        # Rows holding each product id, so a base item is excluded from its own suggestions by index
+        self.rows_by_id: Dict[str, List[int]] = {}
+        for row, item in enumerate(items):
+            self.rows_by_id.setdefault(item.id, []).append(row)
+
 class CompletionService:
     def __init__(self):
         # Define which categories are needed to complete each article type
@@ -47,9 +103,32 @@ class CompletionService:
             'Purple': ['White', 'Black', 'Gray', 'Silver']
         }
         
+        # Color ids and compatibility bitmasks: bit j of _compat_mask[i] is set iff colors i and j
+        # are compatible (symmetric, and every color is compatible with itself)
+        self._color_id: Dict[str, int] = {}
+        self._color_names: List[str] = []  # Normalized color name by id
+        self._compat_mask: List[int] = []
+        self._wildcard_mask = 0  # Colors compatible with everything ('*')
+        self._raw_color_id: Dict[str, int] = {}  # Raw (unnormalized) color string -> id
+        self._raw_color_code: Dict[str, int] = {}  # Raw color string -> code, for exact preference matches
+        self._style_id: Dict[str, int] = {}  # Raw usage string -> style group id
+        self._compat_matrix = None  # numpy view of _compat_mask, rebuilt when new colors appear
+        self._build_color_masks()
+        # Every (color bucket, style bucket) rationale pre-joined; missing buckets map to None
+        self._rationale_templates: Dict[Tuple[Optional[int], Optional[int]], str] = {
+            (color_bucket, style_bucket): '. '.join(
+                phrase for phrase in (
+                    RATIONALE_COLOR_PHRASES.get(color_bucket), RATIONALE_STYLE_PHRASES.get(style_bucket)
+                ) if phrase
+            ) or RATIONALE_FALLBACK
+            for color_bucket in (*RATIONALE_COLOR_PHRASES, None)
+            for style_bucket in (*RATIONALE_STYLE_PHRASES, None)
+        }
+        
         # Performance settings
         self.max_suggestions_per_category = 3
         self.max_processing_time = 1.0  # 1 second max per item
+        self.max_batch_processing_time = 5.0  # Budget for a whole generate_complete_look_batch call
         self.compatibility_threshold = 50  # Minimum score for compatibility
     
     def generate_complete_look(
@@ -80,7 +159,7 @@ class CompletionService:
                 logger.debug(f"No completion rules for article type: {base_item.article_type}")
                 return None
             
-            suggested_items = {}
+            top_items = {}
             
             # Find compatible items in each needed category
             for category in needed_categories:
@@ -90,140 +169,327 @@ class CompletionService:
                     return None
                 
                 if category in all_categories and all_categories[category]:
-                    compatible_items = self._filter_compatible_items(
+                    top_items[category] = self._filter_compatible_items(
                         base_item, 
                         all_categories[category], 
                         user_profile
                     )
-                    
-                    if compatible_items:
-                        # Convert ProductItem objects to ProductItemSummary to avoid circular references
-                        summary_items = [
-                            ProductItemSummary(
-                                id=item.id,
-                                name=item.name,
-                                category=item.category,
-                                article_type=item.article_type,
-                                color=item.color,
-                                image_url=item.image_url,
-                                similarity_score=item.similarity_score
-                            ) for item in compatible_items[:self.max_suggestions_per_category]
-                        ]
-                        suggested_items[category] = summary_items
             
-            # Only return suggestion if we have at least one complete category
-            if suggested_items:
-                style_rationale = self._generate_style_rationale(base_item, suggested_items)
-                
-                return CompleteTheLookSuggestion(
-                    needed_categories=needed_categories,
-                    suggested_items=suggested_items,
-                    style_rationale=style_rationale
-                )
-            else:
-                logger.debug(f"No compatible items found for {base_item.id}")
-                return None
+            return self._build_suggestion(base_item, needed_categories, top_items)
                 
         except Exception as e:
             logger.error(f"Complete look generation failed for {base_item.id}: {e}")
             return None
     
-    def _filter_compatible_items(
-        self, 
-        base_item: ProductItem, 
-        candidate_items: List[ProductItem], 
+    def generate_complete_look_batch(
+        self,
+        base_items: List[ProductItem],
+        all_categories: Dict[str, List[ProductItem]],
         user_profile: UserProfile
-    ) -> List[ProductItem]:
+    ) -> List[Optional[CompleteTheLookSuggestion]]:
         """
-        Smart filtering considering color, style, and user preferences
+        Generate complete looks for many base items at once, in the order given
+        Each needed category is scored for all of its base items in one matrix operation.
+        Falls back to per-item generation when numpy is unavailable.
         """
-        compatible_items = []
+        caches = self.register_categories(all_categories)
+        if not caches:
+            return [self.generate_complete_look(item, all_categories, user_profile) for item in base_items]
         
-        for candidate in candidate_items:
-            # Skip the same item
-            if candidate.id == base_item.id:
-                continue
+        start_time = time.time()
+        try:
+            # Positions of the base items that need each category
+            bases_by_category: Dict[str, List[int]] = {}
+            for position, item in enumerate(base_items):
+                for category in self.completion_rules.get(item.article_type, []):
+                    if category in caches:
+                        bases_by_category.setdefault(category, []).append(position)
+            
+            pref_mask = self._preference_mask(user_profile)
+            top_items: List[Dict[str, List[ProductItem]]] = [{} for _ in base_items]
+            timed_out = set()
+            
+            for category, positions in bases_by_category.items():
+                if time.time() - start_time > self.max_batch_processing_time:
+                    # Like a per-item timeout: items still missing a category get no look
+                    logger.warning(f"Complete look batch timeout with {category} unscored")
+                    timed_out.update(positions)
+                    continue
                 
-            score = self._calculate_compatibility_score(base_item, candidate, user_profile)
+                ranked = self._rank_candidates_batch(
+                    [base_items[position] for position in positions],
+                    caches[category],
+                    pref_mask
+                )
+                for position, items in zip(positions, ranked):
+                    top_items[position][category] = items
             
-            if score >= self.compatibility_threshold:
-                compatible_items.append((candidate, score))
+            return [
+                None if position in timed_out else self._build_suggestion(
+                    item, self.completion_rules.get(item.article_type, []), top_items[position]
+                )
+                for position, item in enumerate(base_items)
+            ]
         
-        # Sort by compatibility score and return top items
-        compatible_items.sort(key=lambda x: x[1], reverse=True)
-        return [item for item, _ in compatible_items]
+        except Exception as e:
+            logger.error(f"Batch complete look generation failed: {e}")
+            return [None] * len(base_items)
     
-    def _calculate_compatibility_score(
-        self, 
-        base_item: ProductItem, 
-        candidate: ProductItem, 
-        user_profile: UserProfile
-    ) -> float:
+    def _rank_candidates_batch(
+        self,
+        base_items: List[ProductItem],
+        cache: CategoryCache,
+        pref_mask: "np.ndarray"
+    ) -> List[List[ProductItem]]:
         """
-        Calculate compatibility score between base item and candidate
+        Top compatible candidates of one category for each base item, from a (bases x candidates) score matrix
+        Same scores and ordering as _filter_compatible_items
         """
-        score = 0
+        base_color_ids = np.fromiter((self._color_id_of(item.color) for item in base_items), dtype=np.int32)
+        base_style_ids = np.fromiter((self._style_id_of(item.usage) for item in base_items), dtype=np.int32)
         
-        # 1. Color compatibility (40% weight)
-        if self._colors_are_compatible(base_item.color, candidate.color):
-            score += 40
+        color_ok = self._get_compat_matrix()[base_color_ids[:, None], cache.color_ids[None, :]]
+        style_ok = base_style_ids[:, None] == cache.style_ids[None, :]
+        pref_ok = pref_mask[cache.raw_color_codes]
+        scores = 40 * color_ok + 30 * style_ok + 20 * pref_ok + cache.similarity * 10
         
-        # 2. Style consistency (30% weight)
-        if self._styles_are_compatible(base_item.usage, candidate.usage):
-            score += 30
+        valid = scores >= self.compatibility_threshold
+        for base, item in enumerate(base_items):
+            own_rows = cache.rows_by_id.get(item.id)
+            if own_rows:
+                valid[base, own_rows] = False
+        # Rejected candidates rank last
+        order = self._top_k_rows(np.where(valid, -scores, np.inf))
         
-        # 3. User preference alignment (20% weight)
-        if user_profile.preferred_colors and candidate.color in user_profile.preferred_colors:
-            score += 20
+        return [
+            [cache.items[i] for i in row if valid[base, i]]
+            for base, row in enumerate(order)
+        ]
+    
+    def _build_suggestion(
+        self,
+        base_item: ProductItem,
+        needed_categories: List[str],
+        top_items: Dict[str, List[ProductItem]]
+    ) -> Optional[CompleteTheLookSuggestion]:
+        """
+        Turn the ranked compatible items per category into a complete look suggestion
+        """
+        suggested_items = {}
+        for category in needed_categories:
+            items = top_items.get(category)
+            if items:
+                # Convert ProductItem objects to ProductItemSummary to avoid circular references
+                suggested_items[category] = [
+                    ProductItemSummary(
+                        id=item.id,
+                        name=item.name,
+                        category=item.category,
+                        article_type=item.article_type,
+                        color=item.color,
+                        image_url=item.image_url,
+                        similarity_score=item.similarity_score
+                    ) for item in items[:self.max_suggestions_per_category]
+                ]
         
-        # 4. Similarity score (10% weight)
-        similarity_bonus = (candidate.similarity_score or 0.5) * 10
-        score += similarity_bonus
+        # Only return suggestion if we have at least one complete category
+        if not suggested_items:
+            logger.debug(f"No compatible items found for {base_item.id}")
+            return None
         
-        return score
+        return CompleteTheLookSuggestion(
+            needed_categories=needed_categories,
+            suggested_items=suggested_items,
+            style_rationale=self._generate_style_rationale(base_item, suggested_items)
+        )
     
-    def _colors_are_compatible(self, color1: str, color2: str) -> bool:
+    def _filter_compatible_items(
+        self, 
+        base_item: ProductItem, 
+        candidate_items: List[ProductItem], 
+        user_profile: UserProfile
+    ) -> List[ProductItem]:
         """
-        Check if two colors are compatible
+        Smart filtering considering color, style, and user preferences
         """
-        # Normalize colors (handle case variations)
-        color1 = color1.strip().title()
-        color2 = color2.strip().title()
+        # Exclude the base item once up front rather than testing it in the scoring loop
+        base_id = base_item.id
+        candidates = [candidate for candidate in candidate_items if candidate.id != base_id]
+        threshold = self.compatibility_threshold
         
-        # Check if color1 is compatible with color2
-        if color1 in self.color_compatibility:
-            compatible_colors = self.color_compatibility[color1]
-            if '*' in compatible_colors or color2 in compatible_colors:
-                return True
+        # Per-base values and bound methods hoisted out of the loop
+        base_color_id = self._color_id_of(base_item.color)
+        base_style_id = self._style_id_of(base_item.usage)
+        pref_colors = frozenset(user_profile.preferred_colors or ())
+        compat_mask = self._compat_mask
+        color_id_of = self._color_id_of
+        style_id_of = self._style_id_of
         
-        # Check reverse compatibility
-        if color2 in self.color_compatibility:
-            compatible_colors = self.color_compatibility[color2]
-            if '*' in compatible_colors or color1 in compatible_colors:
-                return True
+        def compatible_items():
+            for candidate in candidates:
+                # Color 40, style 30, user preference 20, similarity 10
+                color_id = color_id_of(candidate.color)
+                score = 0
+                # Read the base mask after resolving the candidate: a new color updates it
+                if (compat_mask[base_color_id] >> color_id) & 1:
+                    score += 40
+                if style_id_of(candidate.usage) == base_style_id:
+                    score += 30
+                if candidate.color in pref_colors:
+                    score += 20
+                score += (candidate.similarity_score or 0.5) * 10
+                if score >= threshold:
+                    yield candidate, score
         
-        # Same color is always compatible
-        return color1 == color2
+        # Streamed into a k-sized heap, never materialized; nlargest is stable, like sort(reverse=True)
+        top_items = heapq.nlargest(self.max_suggestions_per_category, compatible_items(), key=operator.itemgetter(1))
+        return [item for item, _ in top_items]
     
-    def _styles_are_compatible(self, usage1: str, usage2: str) -> bool:
+    def register_categories(self, all_categories: Dict[str, List[ProductItem]]) -> Dict[str, CategoryCache]:
         """
-        Check if two usage styles are compatible
+        Build struct-of-arrays caches for every category, once per set of recommendations
+        Returns an empty dict when numpy is unavailable, which selects the per-item path
         """
-        # Normalize usage strings
-        usage1 = usage1.strip().lower()
-        usage2 = usage2.strip().lower()
+        if not NUMPY_AVAILABLE:
+            return {}
         
-        # Define style compatibility groups
-        casual_styles = ['casual', 'sports', 'home', 'travel']
-        formal_styles = ['formal', 'party', 'ethnic']
+        caches = {}
+        for category, items in all_categories.items():
+            if not items:
+                continue
+            caches[category] = CategoryCache(
+                items=items,
+                color_ids=np.fromiter((self._color_id_of(item.color) for item in items), dtype=np.int32, count=len(items)),
+                raw_color_codes=np.fromiter(
+                    (self._raw_color_code_of(item.color) for item in items), dtype=np.int32, count=len(items)
+                ),
+                style_ids=np.fromiter((self._style_id_of(item.usage) for item in items), dtype=np.int32, count=len(items)),
+                # Same fallback as the per-item path: missing (or zero) similarity counts as 0.5
+                similarity=np.fromiter(
+                    (item.similarity_score or 0.5 for item in items), dtype=np.float64, count=len(items)
+                )
+            )
+        return caches
+    
+    def _top_k_rows(self, keys: "np.ndarray") -> "np.ndarray":
+        """
+        Column indices of the max_suggestions_per_category smallest keys in each row, smallest first
+        Equal keys keep column order, matching a stable sort, but only the top k are ordered:
+        partition finds each row's k-th key, everything below it plus the first ties is selected.
+        """
+        k = self.max_suggestions_per_category
+        rows, cols = keys.shape
+        if cols <= k:
+            return np.argsort(keys, axis=1, kind="stable")
         
-        # Check if both are in the same style group
-        if (usage1 in casual_styles and usage2 in casual_styles) or \
-           (usage1 in formal_styles and usage2 in formal_styles):
-            return True
+        kth = np.partition(keys, k - 1, axis=1)[:, k - 1:k]
+        below = keys < kth
+        ties = keys == kth
+        ties_needed = k - below.sum(axis=1, keepdims=True)
+        selected = below | (ties & (np.cumsum(ties, axis=1) <= ties_needed))
         
-        # Same usage is always compatible
-        return usage1 == usage2
+        # Exactly k columns per row, in column order; order them by key, stably
+        picked = np.nonzero(selected)[1].reshape(rows, k)
+        order = np.argsort(np.take_along_axis(keys, picked, axis=1), axis=1, kind="stable")
+        return np.take_along_axis(picked, order, axis=1)
+    
+    def _build_color_masks(self) -> None:
+        """
+        Assign every color in the compatibility matrix an id and expand the matrix into bitmasks
+        """
+        for color, compatible_colors in self.color_compatibility.items():
+            color_id = self._get_color_id(color)
+            if '*' in compatible_colors:
+                self._wildcard_mask |= 1 << color_id
+                for other_id in range(len(self._compat_mask)):
+                    self._link_colors(color_id, other_id)
+            for other in compatible_colors:
+                if other != '*':
+                    self._link_colors(color_id, self._get_color_id(other))
+    
+    def _link_colors(self, id1: int, id2: int) -> None:
+        self._compat_mask[id1] |= 1 << id2
+        self._compat_mask[id2] |= 1 << id1
+    
+    def _get_color_id(self, color: str) -> int:
+        """
+        Id of a normalized color name, registering unseen colors on first use
+        """
+        color_id = self._color_id.get(color)
+        if color_id is None:
+            color_id = len(self._compat_mask)
+            self._color_id[color] = color_id
+            self._color_names.append(color)
+            # New colors match themselves and any universal color
+            self._compat_mask.append((1 << color_id) | self._wildcard_mask)
+            wildcards = self._wildcard_mask
+            while wildcards:
+                lowest = wildcards & -wildcards
+                self._compat_mask[lowest.bit_length() - 1] |= 1 << color_id
+                wildcards ^= lowest
+        return color_id
+    
+    def _color_id_of(self, color: str) -> int:
+        """
+        Id of a raw product color; normalization runs once per distinct raw string
+        """
+        color_id = self._raw_color_id.get(color)
+        if color_id is None:
+            color_id = self._get_color_id(color.strip().title())
+            self._raw_color_id[color] = color_id
+        return color_id
+    
+    def _normalized_color(self, color: str) -> str:
+        """
+        Title-cased color name, memoized through the color id tables
+        """
+        return self._color_names[self._color_id_of(color)]
+    
+    def _raw_color_code_of(self, color: str) -> int:
+        code = self._raw_color_code.get(color)
+        if code is None:
+            code = len(self._raw_color_code)
+            self._raw_color_code[color] = code
+        return code
+    
+    def _preference_mask(self, user_profile: UserProfile) -> "np.ndarray":
+        """
+        Lookup table over raw color codes, True for the user's preferred colors
+        Indexing it with candidate codes replaces a per-candidate membership test
+        """
+        pref_codes = [self._raw_color_code_of(color) for color in user_profile.preferred_colors or ()]
+        pref_mask = np.zeros(len(self._raw_color_code), dtype=bool)
+        pref_mask[pref_codes] = True
+        return pref_mask
+    
+    def _get_compat_matrix(self) -> "np.ndarray":
+        """
+        Boolean matrix form of the compatibility bitmasks, rebuilt only after new colors register
+        """
+        size = len(self._compat_mask)
+        if self._compat_matrix is None or len(self._compat_matrix) != size:
+            self._compat_matrix = np.array(
+                [[(mask >> j) & 1 for j in range(size)] for mask in self._compat_mask],
+                dtype=bool
+            ).reshape(size, size)
+        return self._compat_matrix
+    
+    def _style_id_of(self, usage: str) -> int:
+        """
+        Style group id of a raw usage string: compatible usages share an id, others get their own
+        """
+        style_id = self._style_id.get(usage)
+        if style_id is None:
+            normalized = usage.strip().lower()
+            style_id = STYLE_GROUPS.get(normalized)
+            if style_id is None:
+                # Other usages are only compatible with the same normalized usage
+                style_id = self._style_id.get(normalized)
+            if style_id is None:
+                style_id = FORMAL_STYLE_GROUP + 1 + len(self._style_id)
+                self._style_id[normalized] = style_id
+            self._style_id[usage] = style_id
+        return style_id
     
     def _generate_style_rationale(
         self, 
@@ -233,26 +499,18 @@ class CompletionService:
         """
         Generate a brief explanation of why these items work together
         """
-        rationales = []
-        
-        # Color-based rationale
-        base_color = base_item.color.strip().title()
-        suggested_colors = []
-        for category_items in suggested_items.values():
-            for item in category_items[:1]:  # Just first item from each category
-                suggested_colors.append(item.color.strip().title())
-        
-        if base_color == 'White':
-            rationales.append(f"White {base_item.article_type.lower()} pairs beautifully with any color")
-        elif base_color == 'Black':
-            rationales.append(f"Black {base_item.article_type.lower()} creates a versatile foundation")
-        elif suggested_colors:
-            rationales.append(f"{base_color} {base_item.article_type.lower()} complements {', '.join(suggested_colors[:2]).lower()}")
+        base_color = self._normalized_color(base_item.color)
+        # First item of the first two non-empty categories
+        suggested_colors = [
+            self._normalized_color(category_items[0].color)
+            for category_items in suggested_items.values() if category_items
+        ][:2]
         
-        # Style-based rationale
-        if base_item.usage.lower() in ['casual', 'sports']:
-            rationales.append("Perfect for a relaxed, comfortable look")
-        elif base_item.usage.lower() in ['formal', 'party']:
-            rationales.append("Ideal for a polished, sophisticated appearance")
+        color_bucket = RATIONALE_COLOR_BUCKETS.get(base_color, 2 if suggested_colors else None)
+        style_bucket = RATIONALE_STYLE_BUCKETS.get(base_item.usage.lower())
         
-        return '. '.join(rationales) if rationales else f"These pieces create a cohesive look with your {base_item.article_type.lower()}" 
\ No newline at end of file
+        return self._rationale_templates[color_bucket, style_bucket].format(
+            color=base_color,
+            article=base_item.article_type.lower(),
+            suggested=', '.join(suggested_colors).lower()
+        ) 
\ No newline at end of file
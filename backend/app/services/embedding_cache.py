@@ -0,0 +1,102 @@
+"""
+Cache of OpenAI embeddings keyed by model and input text
+A bounded in-process LRU serves hot texts without a network hop; Redis, when configured,
+sits behind it so every worker shares hits
+"""
+import hashlib
+from array import array
+from typing import List, Optional
+from app.config import settings
+from app.utils.logging import get_logger
+from app.utils.ttl_cache import TTLCache
+
+# Optional Redis dependency - graceful fallback to in-process storage
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        ttl_sec: Optional[int] = None,
+        max_items: Optional[int] = None,
+        redis_url: Optional[str] = None
+    ):
+        self.ttl_sec = ttl_sec if ttl_sec is not None else settings.embedding_cache_ttl_seconds
+        self.local = TTLCache(
+            max_items=max_items if max_items is not None else settings.embedding_cache_max_items,
+            ttl_sec=self.ttl_sec
+        )
+        self.redis = None
+
+        redis_url = redis_url if redis_url is not None else settings.redis_url
+        if redis_url:
+            if REDIS_AVAILABLE:
+                pool = aioredis.ConnectionPool.from_url(
+                    redis_url,
+                    max_connections=settings.redis_max_connections
+                )
+                self.redis = aioredis.Redis(connection_pool=pool)
+                logger.info("Using Redis embedding cache")
+            else:
+                logger.warning("REDIS_URL is set but redis is not installed, using in-process embedding cache")
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self.redis is not None else "memory"
+
+    @staticmethod
+    def _key(text: str) -> str:
+        model = f"{settings.embedding_model}:{settings.embedding_dimension}"
+        return "emb:" + hashlib.sha256(f"{model}|{text}".encode()).hexdigest()
+
+    async def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Cached embeddings in input order, None for misses
+        The in-process tier is checked first; only its misses go to Redis
+        """
+        keys = [self._key(text) for text in texts]
+        # Local entries are compact float32 arrays, expanded to a fresh list per hit
+        local_hits = [self.local.get(key) for key in keys]
+        embeddings = [values.tolist() if values is not None else None for values in local_hits]
+
+        missing = [i for i, values in enumerate(local_hits) if values is None]
+        if missing and self.redis is not None:
+            try:
+                raws = await self.redis.mget([keys[i] for i in missing])
+            except Exception as e:
+                logger.error(f"Redis embedding cache read failed, using in-process cache only: {e}")
+                return embeddings
+            for i, raw in zip(missing, raws):
+                if raw is not None:
+                    values = array("f")
+                    values.frombytes(raw)
+                    self.local.set(keys[i], values)
+                    embeddings[i] = values.tolist()
+        return embeddings
+
+    async def set_many(self, texts: List[str], embeddings: List[List[float]]) -> None:
+        """
+        Store embeddings for texts in both tiers, restarting their TTL
+        """
+        keys = [self._key(text) for text in texts]
+        packed = [array("f", embedding) for embedding in embeddings]
+        for key, values in zip(keys, packed):
+            self.local.set(key, values)
+
+        if self.redis is not None:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key, values in zip(keys, packed):
+                        pipe.set(key, values.tobytes(), ex=self.ttl_sec)
+                    await pipe.execute()
+            except Exception as e:
+                logger.error(f"Redis embedding cache write failed, kept in-process only: {e}")
+
+    async def close(self) -> None:
+        if self.redis is not None:
+            await self.redis.aclose()
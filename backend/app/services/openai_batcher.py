@@ -0,0 +1,75 @@
+"""
+Request-coalescing micro-batcher for OpenAI embedding calls
+Concurrent in-flight requests are packed into a single embeddings.create call
+"""
+import asyncio
+from typing import List, Optional, Set, Tuple
+from openai import AsyncOpenAI
+from app.config import settings
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+class OpenAIBatcher:
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        max_wait_ms: Optional[int] = None,
+        max_batch_size: Optional[int] = None
+    ):
+        self.client = client
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else settings.openai_batch_max_wait_ms
+        self.max_batch_size = max_batch_size if max_batch_size is not None else settings.openai_batch_max_size
+        self._queue: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Queue a text for embedding and wait for its batch to be flushed
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((text, future))
+
+        if len(self._queue) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """
+        Send everything queued so far as one embeddings request
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._queue = self._queue, []
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._send(batch))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """
+        Embed a batch and fan the results back out to the waiting callers
+        """
+        try:
+            response = await self.client.embeddings.create(
+                input=[text for text, _ in batch],
+                **settings.embedding_options
+            )
+            if len(batch) > 1:
+                logger.info(f"Coalesced {len(batch)} embedding requests into one call")
+            for (_, future), data in zip(batch, response.data):
+                if not future.done():
+                    future.set_result(data.embedding)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
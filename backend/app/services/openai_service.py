@@ -1,56 +1,413 @@
+import asyncio
 import base64
+import hashlib
 import json
-from typing import List, Dict, Any, Optional, Tuple
+import re
+import tiktoken
+from typing import AsyncIterator, List, Dict, Any, Hashable, Optional, Set, Tuple
 from openai import AsyncOpenAI
 from app.config import settings
+from app.services.embedding_cache import EmbeddingCache
+from app.services.openai_batcher import OpenAIBatcher
+from app.services.semantic_cache import SemanticCache
+from app.utils.ttl_cache import TTLCache
+from app.utils.http_client import OPENAI_TIMEOUT, get_http_client
+from app.utils.adaptive_limiter import AdaptiveLimiter
 from app.utils.retry import openai_retry
+from app.utils.single_flight import SingleFlight
 from app.utils.logging import get_logger
-from app.models.requests import UserProfile, ChatMessage
+from app.models.requests import UserProfile, ChatMessage, StylePreference
 from app.models.responses import ProductItem
 
+# Optional Aho-Corasick matcher for keyword extraction - falls back to a compiled regex
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Optional fast JSON parser for model responses
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 logger = get_logger(__name__)
 
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so one except clause covers both
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+# Keywords picked out of free-text image analyses, by result field (in output order)
+STYLE_KEYWORDS = {
+    "colors": ["black", "white", "blue", "red", "green", "yellow", "brown", "gray", "pink", "purple", "orange"],
+    "occasions": ["casual", "formal", "business", "party", "wedding", "date", "work", "weekend"],
+    "items": ["shirt", "pants", "dress", "jacket", "shoes", "sneakers", "boots", "jeans", "sweater", "coat"]
+}
+_ALL_STYLE_KEYWORDS = sorted({kw for kws in STYLE_KEYWORDS.values() for kw in kws}, key=len, reverse=True)
+
+def _build_style_automaton():
+    automaton = ahocorasick.Automaton()
+    for keyword in _ALL_STYLE_KEYWORDS:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+# One scan for every keyword. The automaton reports every occurrence, like testing each keyword
+# with `in`; the regex fallback's lookahead does too, as long as no keyword is a prefix of another
+_STYLE_AUTOMATON = _build_style_automaton() if AHOCORASICK_AVAILABLE else None
+_STYLE_KEYWORD_RE = re.compile("(?=(" + "|".join(_ALL_STYLE_KEYWORDS) + "))")
+
+# Catalog vocabulary appended to search queries for each preferred style, a fixed stand-in for GPT rewriting
+STYLE_QUERY_EXPANSIONS = {
+    StylePreference.CASUAL: "everyday relaxed",
+    StylePreference.FORMAL: "tailored office",
+    StylePreference.SMART_CASUAL: "polished relaxed",
+    StylePreference.SPORTY: "sports athletic active",
+    StylePreference.ELEGANT: "refined party",
+    StylePreference.TRENDY: "fashionable modern",
+    StylePreference.CLASSIC: "timeless traditional"
+}
+
+# User messages mentioning any of these are treated as updating the shopping context
+CHAT_CONTEXT_KEYWORDS = (
+    "prefer", "like", "want", "looking for", "change", "update", "style", "color",
+    "outfit", "occasion", "budget", "size", "fit", "trend", "classic", "formal",
+    "casual", "work", "party", "date", "wedding", "travel"
+)
+# Substring match like `keyword in message.lower()`, in one case-insensitive scan
+_CHAT_CONTEXT_RE = re.compile("|".join(map(re.escape, CHAT_CONTEXT_KEYWORDS)), re.IGNORECASE)
+CHAT_FALLBACK_MESSAGE = "I'm sorry, I'm having trouble with my styling advice right now. Please try again in a moment!"
+
+# Panel positions for try-on grids, by product count; DALL-E returns one square image per call
+TRYON_GRID_LAYOUTS = {
+    2: ("side-by-side pair of photos", ("left", "right")),
+    3: ("2x2 grid of photos", ("top-left", "top-right", "bottom-left")),
+    4: ("2x2 grid of photos", ("top-left", "top-right", "bottom-left", "bottom-right"))
+}
+TRYON_GRID_MAX_PRODUCTS = max(TRYON_GRID_LAYOUTS)
+
+# System prompts are built once; message lists share these dicts and never mutate them
+_CHAT_SYSTEM_PROMPT = """You are Ray, a world-class fashion stylist and color expert with years of experience in high-end fashion. You're passionate about helping people discover their personal style and feel confident in their clothing choices.
+
+        Your expertise includes:
+        - Color theory and seasonal color analysis
+        - Style archetypes and body type recommendations  
+        - Fashion trends and timeless pieces
+        - Accessory coordination and styling
+        - Fabric knowledge and garment construction
+        - Occasion-appropriate dressing
+        - Mix-and-match outfit creation
+        - Personal shopping and wardrobe building
+
+        Guidelines for your responses:
+        - Be enthusiastic and encouraging about fashion
+        - Provide specific, actionable styling advice
+        - Reference color theory when discussing color combinations
+        - Suggest outfit formulas and styling tricks
+        - Mention specific brands or style inspirations when relevant
+        - Ask clarifying questions to better understand their needs
+        - Use fashion terminology appropriately but explain when needed
+        - Be inclusive and body-positive in all recommendations
+        - Focus on building confidence through great style choices
+        - Reference their current recommendations and preferences from context
+
+        Tone: Warm, knowledgeable, enthusiastic, and supportive - like a trusted friend who happens to be a fashion expert."""
+_CHAT_SYSTEM_MSG = {"role": "system", "content": _CHAT_SYSTEM_PROMPT}
+
+_SELFIE_SYSTEM_PROMPT = """You are a professional portrait photographer and facial analysis expert. Analyze this person's photo with extreme detail to preserve their exact appearance in virtual try-on generation.
+
+        Focus on capturing:
+        1. FACIAL FEATURES: Exact details that make this person unique
+        2. PHYSICAL CHARACTERISTICS: Body type, posture, distinctive features  
+        3. POSE & EXPRESSION: Head angle, body position, facial expression
+        4. LIGHTING & ENVIRONMENT: Light direction, intensity, background
+        5. PHOTOGRAPHY STYLE: Camera angle, framing, aesthetic
+
+        Be extremely specific - these details will be used to recreate this exact person in AI-generated images."""
+_SELFIE_SYSTEM_MSG = {"role": "system", "content": _SELFIE_SYSTEM_PROMPT}
+
+_SELFIE_USER_PROMPT = """Analyze this person's selfie with maximum detail for virtual try-on generation. I need to preserve their exact appearance when showing them wearing different clothes.
+
+        Return detailed JSON with specific descriptive terms:
+        {
+            "facial_features": {
+                "face_shape": "oval/round/square/heart/diamond",
+                "eye_color": "specific color",
+                "eye_shape": "almond/round/hooded etc",
+                "eyebrow_style": "thick/thin/arched etc",
+                "nose_shape": "straight/button/aquiline etc",
+                "lip_shape": "full/thin/bow-shaped etc",
+                "skin_tone": "fair/medium/olive/dark with undertones",
+                "distinctive_features": "freckles/dimples/moles/scars etc"
+            },
+            "hair_details": {
+                "color": "exact color description",
+                "style": "short/long/curly/straight/wavy",
+                "texture": "fine/thick/coarse",
+                "length": "specific length description"
+            },
+            "physical_build": {
+                "body_type": "petite/average/tall/athletic etc",
+                "build": "slim/average/curvy/muscular etc",
+                "posture": "straight/relaxed/confident etc"
+            },
+            "pose_and_expression": {
+                "head_angle": "straight/tilted left/right",
+                "body_orientation": "facing camera/3-quarter turn etc",
+                "facial_expression": "smiling/serious/neutral etc",
+                "eye_contact": "direct/looking away etc"
+            },
+            "lighting_and_setting": {
+                "lighting_type": "natural/artificial/studio",
+                "light_direction": "front/side/top",
+                "lighting_quality": "soft/harsh/diffused",
+                "background": "plain/indoor/outdoor/textured",
+                "background_color": "specific color if visible",
+                "overall_mood": "bright/moody/professional etc"
+            },
+            "photography_style": {
+                "camera_angle": "eye level/slightly above/below",
+                "framing": "headshot/bust/full body",
+                "photo_quality": "professional/casual/phone selfie",
+                "image_sharpness": "crisp/soft/slightly blurred"
+            },
+            "age_range": "specific age estimate",
+            "gender_presentation": "masculine/feminine/androgynous",
+            "overall_vibe": "confident/casual/professional/artistic etc"
+        }"""
+
+_PRODUCT_SYSTEM_PROMPT = """You are a fashion expert and product photographer. Analyze this clothing item image with extreme detail for virtual try-on generation.
+
+        Focus on:
+        1. EXACT VISUAL APPEARANCE: Colors, patterns, textures, materials
+        2. GARMENT CONSTRUCTION: Cut, fit, silhouette, design details
+        3. STYLING ELEMENTS: Necklines, sleeves, hemlines, closures
+        4. FABRIC CHARACTERISTICS: Drape, structure, weight, finish
+        5. DESIGN DETAILS: Buttons, zippers, embellishments, prints
+
+        Be extremely specific about what you see - this will be used to recreate this exact item on a person."""
+_PRODUCT_SYSTEM_MSG = {"role": "system", "content": _PRODUCT_SYSTEM_PROMPT}
+
+_PRODUCT_USER_PROMPT = """Analyze this clothing item image in detail for virtual try-on generation. I need to accurately show this exact item being worn by someone.
+
+        Return detailed JSON:
+        {
+            "item_type": "specific garment type",
+            "visual_description": {
+                "primary_color": "exact color name and shade",
+                "secondary_colors": ["any accent colors"],
+                "pattern": "solid/striped/floral/geometric/etc",
+                "pattern_details": "specific pattern description if any",
+                "fabric_type": "cotton/silk/denim/knit/etc",
+                "fabric_texture": "smooth/textured/ribbed/etc",
+                "fabric_weight": "lightweight/medium/heavy",
+                "fabric_finish": "matte/shiny/satin/etc"
+            },
+            "garment_details": {
+                "silhouette": "fitted/loose/oversized/tailored/etc",
+                "neckline": "crew/v-neck/scoop/high-neck/etc",
+                "sleeve_type": "short/long/sleeveless/3-quarter/etc",
+                "sleeve_style": "fitted/loose/bell/etc",
+                "hemline": "cropped/regular/long/etc",
+                "closure_type": "buttons/zipper/pullover/etc",
+                "fit_style": "slim/regular/relaxed/oversized"
+            },
+            "design_elements": {
+                "embellishments": "buttons/sequins/embroidery/none",
+                "hardware": "zippers/buckles/grommets/none",
+                "special_features": "pockets/hood/collar/etc",
+                "trim_details": "piping/contrast stitching/etc"
+            },
+            "styling_context": {
+                "formality_level": "casual/business casual/formal/etc",
+                "season": "spring/summer/fall/winter/year-round",
+                "occasion": "everyday/work/party/etc",
+                "styling_suggestions": "how this item typically fits and drapes"
+            },
+            "brand_style": "if visible, brand aesthetic",
+            "overall_vibe": "classic/trendy/edgy/romantic/etc"
+        }"""
+
+_chat_encoding = None
+_chat_encoding_loaded = False
+
+def _count_tokens(text: str) -> int:
+    """
+    Count tokens for the chat model, estimating when the encoding is unavailable
+    """
+    global _chat_encoding, _chat_encoding_loaded
+    if not _chat_encoding_loaded:
+        _chat_encoding_loaded = True
+        try:
+            _chat_encoding = tiktoken.encoding_for_model(settings.gpt_model)
+        except Exception as e:
+            logger.warning(f"Could not load tiktoken encoding for {settings.gpt_model}, estimating tokens: {e}")
+
+    if _chat_encoding is None:
+        return len(text) // 4 + 1
+    return len(_chat_encoding.encode(text))
+
+def trim_history_to_budget(history: List[ChatMessage], budget: int) -> List[ChatMessage]:
+    """
+    Keep the most recent turns that fit in the token budget
+    A leading system message is always preserved
+    """
+    pinned = [history[0]] if history and history[0].role == "system" else []
+    remaining = budget - sum(_count_tokens(msg.content) for msg in pinned)
+
+    kept = []
+    for msg in reversed(history[len(pinned):]):
+        tokens = _count_tokens(msg.content)
+        if tokens > remaining:
+            break
+        kept.append(msg)
+        remaining -= tokens
+
+    kept.reverse()
+    return pinned + kept
+
+def _vision_image_url(image: str) -> str:
+    """
+    URL to hand the vision model for an image given as a URL or as raw base64
+    http(s) and data URLs are passed through, so hosted images are referenced instead of inlined
+    """
+    if image.startswith(("https://", "http://", "data:")):
+        return image
+    return f"data:image/jpeg;base64,{image}"
+
+def _build_vision_content(prompt_text: str, images: List[str]) -> List[Dict[str, Any]]:
+    """
+    Vision message content: the prompt followed by each image at low detail
+    Copies every inlined base64 image, so it is run off the event loop
+    """
+    content = [{"type": "text", "text": prompt_text}]
+    for image in images:
+        content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": _vision_image_url(image),
+                "detail": "low"  # Use low detail for cost efficiency
+            }
+        })
+    return content
+
+def _image_hash(image: str) -> bytes:
+    return hashlib.sha256(image.encode()).digest()
+
+def _image_set_hash(images: List[str]) -> bytes:
+    """
+    Content hash of a set of images, independent of their order
+    """
+    image_digests = sorted(_image_hash(image) for image in images)
+    return hashlib.sha256(b"".join(image_digests)).digest()
+
 class OpenAIService:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=get_http_client(),
+            timeout=OPENAI_TIMEOUT
+        )
+        self.batcher = OpenAIBatcher(self.client)
+        self.embedding_cache = EmbeddingCache()
+        # Embedding chunk fan-out, widened while the API keeps up and halved on throttling or slowdowns
+        self._embedding_limiter = AdaptiveLimiter(
+            initial=settings.embedding_concurrency,
+            max_limit=settings.embedding_concurrency_max,
+            latency_target_sec=settings.embedding_latency_target_seconds
+        )
+        # Identical concurrent embedding/vision calls share one in-flight request
+        self._single_flight = SingleFlight()
         self.assistant_id = None
-        
+        # Selfie vision descriptions keyed by image hash, reused across try-ons
+        self._selfie_desc_cache = TTLCache(max_items=512, ttl_sec=1800)
+        # Inspiration analyses keyed by the content hash of the image set; users re-upload the same photos
+        self._inspiration_cache = TTLCache(max_items=512, ttl_sec=7 * 24 * 3600)
+        # Catalog image analyses keyed by (product id, image URL); the hosted image is the identity
+        self._product_analysis_cache = TTLCache(max_items=4096, ttl_sec=30 * 24 * 3600)
+        # GPT-enhanced search queries keyed by the hash of the basic query they were built from
+        self._search_query_cache = TTLCache(max_items=1024, ttl_sec=3600)
+        # Background enhancements in flight, by query hash
+        self._query_enhancements: Dict[bytes, asyncio.Task] = {}
+        # GPT rankings, reused for near-identical shopping prompts over the same candidates
+        self._ranking_cache = SemanticCache(threshold=settings.ranking_cache_threshold)
+        # Background tasks embedding the key of a fresh ranking before it is cached
+        self._ranking_stores: Set[asyncio.Task] = set()
+
     @openai_retry
     async def get_query_embedding(self, text: str) -> List[float]:
         """
         Generate embedding for search query
+        Cached embeddings are reused; concurrent misses are coalesced into a single embeddings request
+        and concurrent calls for the same text share one lookup
         """
-        response = await self.client.embeddings.create(
-            input=text,
-            model=settings.embedding_model
-        )
-        return response.data[0].embedding
+        return await self._single_flight.run(("embedding", text), lambda: self._embed_query(text))
+    
+    async def _embed_query(self, text: str) -> List[float]:
+        cached = (await self.embedding_cache.get_many([text]))[0]
+        if cached is not None:
+            return cached
+        
+        embedding = await self.batcher.embed(text)
+        await self.embedding_cache.set_many([text], [embedding])
+        return embedding
     
     @openai_retry
     async def get_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for a batch of texts efficiently
         Following OpenAI cookbook approach for cost-effective embedding generation
+        Large batches are split into API-sized chunks that are requested concurrently
+        Only texts missing from the embedding cache are sent to the API
         """
         if not texts:
             return []
         
-        try:
-            response = await self.client.embeddings.create(
-                input=texts,
-                model=settings.embedding_model
-            )
-            
-            # Extract embeddings in the same order as input
-            embeddings = [data.embedding for data in response.data]
-            logger.info(f"Generated {len(embeddings)} embeddings in batch")
+        embeddings = await self.embedding_cache.get_many(texts)
+        # Positions of each uncached text; repeated texts are embedded once
+        missing: Dict[str, List[int]] = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(texts[i], []).append(i)
+        if not missing:
+            logger.info(f"Served {len(texts)} embeddings from cache")
             return embeddings
-            
-        except Exception as e:
-            logger.error(f"Error generating batch embeddings: {e}")
-            # Return zero embeddings as fallback
-            zero_embedding = [0.0] * 1536  # text-embedding-3-large dimension
-            return [zero_embedding] * len(texts)
+        
+        # Length-sorted so each request carries similarly sized inputs; results are scattered back by position
+        missing_texts = sorted(missing, key=len)
+        chunk_size = settings.embedding_chunk_size
+        chunks = [missing_texts[i:i + chunk_size] for i in range(0, len(missing_texts), chunk_size)]
+        
+        async def embed_chunk(chunk_texts: List[str]) -> None:
+            try:
+                async with self._embedding_limiter.slot():
+                    response = await self.client.embeddings.create(
+                        input=chunk_texts,
+                        **settings.embedding_options
+                    )
+            except Exception as e:
+                logger.error(f"Error generating batch embeddings: {e}")
+                # Zero embeddings as fallback, for this chunk only; never cached
+                zero_embedding = [0.0] * settings.embedding_dimension
+                for text in chunk_texts:
+                    for i in missing[text]:
+                        embeddings[i] = zero_embedding
+                return
+            # Embeddings come back in the same order as the input
+            fresh = [data.embedding for data in response.data]
+            for text, embedding in zip(chunk_texts, fresh):
+                for i in missing[text]:
+                    embeddings[i] = embedding
+            await self.embedding_cache.set_many(chunk_texts, fresh)
+        
+        await asyncio.gather(*(embed_chunk(chunk) for chunk in chunks))
+        cache_hits = len(texts) - sum(len(positions) for positions in missing.values())
+        logger.info(
+            f"Generated {len(missing_texts)} embeddings in {len(chunks)} batch request(s), "
+            f"{cache_hits} served from cache"
+        )
+        return embeddings
     
     async def create_search_query_from_profile(
         self, 
@@ -58,14 +415,19 @@ class OpenAIService:
         inspiration_analysis: Optional[Dict[str, Any]] = None
     ) -> str:
         """
-        Create enhanced search query from user profile and image analysis
+        Create search query from user profile and image analysis
+        With query enhancement enabled, a GPT-rewritten query is used once it is cached (by the
+        hash of the basic query). On a miss the rewrite runs in the background and this request
+        proceeds with the basic query, so the GPT call is never on the request path.
         """
         # Base query from user profile
+        # Styles and colors go in as individual elements so the query is joined once
         base_elements = [
             user_profile.shopping_prompt,
             user_profile.gender.value,
-            " ".join(user_profile.preferred_styles),
-            " ".join(user_profile.preferred_colors)
+            *user_profile.preferred_styles,
+            *(STYLE_QUERY_EXPANSIONS.get(style) for style in user_profile.preferred_styles),
+            *user_profile.preferred_colors
         ]
         
         # Add image analysis insights if available
@@ -88,8 +450,25 @@ class OpenAIService:
         
         # Create comprehensive search query
         search_query = " ".join(filter(None, base_elements))
+        if not settings.query_enhancement_enabled:
+            return search_query
         
-        # Enhance with GPT-4o mini for better semantic understanding
+        query_hash = hashlib.blake2b(search_query.encode(), digest_size=16).digest()
+        cached_query = self._search_query_cache.get(query_hash)
+        if cached_query is not None:
+            logger.info(f"Using cached enhanced search query: {cached_query}")
+            return cached_query
+        
+        if query_hash not in self._query_enhancements:
+            task = asyncio.create_task(self._enhance_search_query(search_query, query_hash))
+            self._query_enhancements[query_hash] = task
+            task.add_done_callback(lambda _: self._query_enhancements.pop(query_hash, None))
+        return search_query
+    
+    async def _enhance_search_query(self, search_query: str, query_hash: bytes) -> None:
+        """
+        Rewrite a basic search query with GPT-4o mini and cache the result for later requests
+        """
         try:
             prompt = f"""Create an enhanced search query for finding clothing items based on this user request: "{search_query}"
 
@@ -113,29 +492,41 @@ Return only the enhanced search terms, no extra text."""
             
             enhanced_query = response.choices[0].message.content.strip()
             logger.info(f"Enhanced search query: {enhanced_query}")
-            return enhanced_query
+            self._search_query_cache.set(query_hash, enhanced_query)
             
         except Exception as e:
+            # Later requests keep using the basic query and retry the enhancement
             logger.error(f"Error enhancing search query: {e}")
-            return search_query  # Fallback to basic query
     
     @openai_retry
-    async def analyze_inspiration_images(self, base64_images: List[str]) -> Dict[str, Any]:
+    async def analyze_inspiration_images(self, images: List[str]) -> Dict[str, Any]:
         """
         Analyze inspiration images using GPT-4o mini vision capabilities
+        Images may be image URLs or base64; URLs are sent as references rather than inlined
+        Results are cached by the content of the image set, independent of upload order, and
+        concurrent calls with the same images share one vision request
         Returns style insights to enhance search query
         """
-        if not base64_images:
+        if not images:
             return {"items": [], "style_notes": "", "colors": [], "occasions": []}
         
+        # Hashing megabytes of base64 would stall other requests if done on the event loop
+        images_hash = await asyncio.to_thread(_image_set_hash, images)
+        cached_analysis = self._inspiration_cache.get(images_hash)
+        if cached_analysis is not None:
+            logger.info("Using cached inspiration analysis")
+            return cached_analysis
+
+        return await self._single_flight.run(
+            ("inspiration", images_hash), lambda: self._analyze_inspiration_images(images, images_hash)
+        )
+    
+    async def _analyze_inspiration_images(self, images: List[str], images_hash: bytes) -> Dict[str, Any]:
         try:
             # Prepare messages with images for GPT-4o mini
-            content = [
-                {
-                    "type": "text",
-                    "text": """Analyze these fashion inspiration images and provide detailed style insights for a shopping recommendation system.
+            prompt_text = """Analyze these fashion inspiration images and provide detailed style insights for a shopping recommendation system.
 
-Please return a JSON response with:
+Please return a JSON object with:
 1. "items": List of specific clothing items/accessories you see (e.g., "black leather jacket", "white sneakers")
 2. "style_notes": Description of the overall aesthetic and style direction
 3. "colors": List of dominant colors
@@ -143,19 +534,11 @@ Please return a JSON response with:
 5. "gender": Inferred target gender ("men", "women", or "unisex")
 6. "season": Inferred season if applicable ("spring", "summer", "fall", "winter", or "year-round")
 
+Schema:
+{"items": [string], "style_notes": string, "colors": [string], "occasions": [string], "gender": string, "season": string}
+
 Focus on actionable details that would help find similar clothing items."""
-                }
-            ]
-            
-            # Add each image to the content
-            for i, base64_image in enumerate(base64_images):
-                content.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64_image}",
-                        "detail": "low"  # Use low detail for cost efficiency
-                    }
-                })
+            content = await asyncio.to_thread(_build_vision_content, prompt_text, images)
             
             response = await self.client.chat.completions.create(
                 model="gpt-4o-mini",  # GPT-4o mini supports vision
@@ -166,17 +549,17 @@ Focus on actionable details that would help find similar clothing items."""
                     }
                 ],
                 max_tokens=1000,
-                temperature=0.1  # Low temperature for consistent analysis
+                temperature=0.1,  # Low temperature for consistent analysis
+                response_format={"type": "json_object"}  # JSON mode, so the text fallback is a last resort
             )
             
             # Parse the response
             analysis_text = response.choices[0].message.content
             logger.info(f"Image analysis response: {analysis_text}")
             
-            # Try to parse as JSON, fallback to structured parsing
+            # JSON mode should always parse; the text fallback covers truncated replies
             try:
-                import json
-                analysis = json.loads(analysis_text)
+                analysis = _json_loads(analysis_text)
                 
                 # Validate required fields
                 required_fields = ["items", "style_notes", "colors", "occasions"]
@@ -184,7 +567,8 @@ Focus on actionable details that would help find similar clothing items."""
                     if field not in analysis:
                         analysis[field] = []
                 
-                logger.info(f"Successfully analyzed {len(base64_images)} inspiration images")
+                logger.info(f"Successfully analyzed {len(images)} inspiration images")
+                self._inspiration_cache.set(images_hash, analysis)
                 return analysis
                 
             except json.JSONDecodeError:
@@ -201,26 +585,13 @@ Focus on actionable details that would help find similar clothing items."""
         Fallback method to extract style information from text response
         """
         text_lower = text.lower()
-        
-        # Extract basic information using keyword matching
-        colors = []
-        common_colors = ["black", "white", "blue", "red", "green", "yellow", "brown", "gray", "pink", "purple", "orange"]
-        for color in common_colors:
-            if color in text_lower:
-                colors.append(color)
-        
-        occasions = []
-        common_occasions = ["casual", "formal", "business", "party", "wedding", "date", "work", "weekend"]
-        for occasion in common_occasions:
-            if occasion in text_lower:
-                occasions.append(occasion)
-        
-        # Extract items mentioned
-        items = []
-        common_items = ["shirt", "pants", "dress", "jacket", "shoes", "sneakers", "boots", "jeans", "sweater", "coat"]
-        for item in common_items:
-            if item in text_lower:
-                items.append(item)
+        if _STYLE_AUTOMATON is not None:
+            found = {keyword for _, keyword in _STYLE_AUTOMATON.iter(text_lower)}
+        else:
+            found = {match.group(1) for match in _STYLE_KEYWORD_RE.finditer(text_lower)}
+        colors = [kw for kw in STYLE_KEYWORDS["colors"] if kw in found]
+        occasions = [kw for kw in STYLE_KEYWORDS["occasions"] if kw in found]
+        items = [kw for kw in STYLE_KEYWORDS["items"] if kw in found]
         
         return {
             "items": items,
@@ -239,16 +610,20 @@ Focus on actionable details that would help find similar clothing items."""
     ) -> List[ProductItem]:
         """
         Use GPT-4o mini to rank and enhance recommendations based on user profile
+        Lists outside the configured size range are returned in their vector-search order without a GPT call
         """
+        if not settings.rerank_min_items < len(recommendations) <= settings.rerank_max_items:
+            logger.info(f"Skipping GPT ranking for {len(recommendations)} items, keeping similarity order")
+            return recommendations
+        
         system_prompt = """You are a personal fashion stylist. Rank the provided clothing items based on how well they match the user's profile and preferences. Consider style, color, occasion, and overall fit with their requirements.
 
         Return a JSON array of product IDs in order of best match (best first). Include only the IDs, no explanations."""
         
-        # Prepare product summaries
-        product_summaries = []
-        for item in recommendations:
-            summary = f"ID: {item.id}, Name: {item.name}, Type: {item.article_type}, Color: {item.color}, Usage: {item.usage}"
-            product_summaries.append(summary)
+        # One compact line per product; names are capped so verbose catalog entries don't inflate the prompt
+        product_summaries = "\n".join(
+            f"{item.id}|{item.name[:40]}|{item.article_type}|{item.color}|{item.usage}" for item in recommendations
+        )
         
         # Format inspiration analysis if available
         inspiration_text = ""
@@ -268,6 +643,30 @@ Focus on actionable details that would help find similar clothing items."""
             else:
                 inspiration_text = str(inspiration_analysis)
         
+        # Exact preferences and the candidate set must match; the free-text prompt only needs to be close
+        ranking_scope = (
+            user_profile.gender.value,
+            tuple(sorted(style.value for style in user_profile.preferred_styles)),
+            tuple(sorted(user_profile.preferred_colors)),
+            tuple(sorted(user_profile.preferred_article_types)),
+            frozenset(item.id for item in recommendations)
+        )
+        ranking_key_text = None
+        ranking_key = None
+        if settings.semantic_cache_enabled:
+            ranking_key_text = f"{user_profile.shopping_prompt.strip().lower()}|{inspiration_text}"
+            # Only a candidate set that was ranked before can hit, so others skip the key embedding
+            if self._ranking_cache.has_scope(ranking_scope):
+                try:
+                    ranking_key = await self.get_query_embedding(ranking_key_text)
+                except Exception as e:
+                    logger.warning(f"Ranking cache key embedding failed, bypassing cache: {e}")
+            if ranking_key is not None:
+                cached_ids = self._ranking_cache.lookup(ranking_key, ranking_scope)
+                if cached_ids is not None:
+                    logger.info(f"Using cached ranking for {len(recommendations)} items")
+                    return self._apply_ranking(recommendations, cached_ids)
+        
         user_prompt = f"""
         User Profile:
         - Shopping Intent: {user_profile.shopping_prompt}
@@ -278,8 +677,8 @@ Focus on actionable details that would help find similar clothing items."""
         
         {f"Inspiration Analysis: {inspiration_text}" if inspiration_text else ""}
         
-        Products to rank:
-        {chr(10).join(product_summaries)}
+        Products to rank (ID|Name|Type|Color|Usage):
+        {product_summaries}
         
         Return JSON array of product IDs ranked by best match.
         """
@@ -297,30 +696,78 @@ Focus on actionable details that would help find similar clothing items."""
             )
             
             # Parse ranking
-            ranking_data = json.loads(response.choices[0].message.content)
+            ranking_data = _json_loads(response.choices[0].message.content)
             ranked_ids = ranking_data.get("ranking", [])
             
-            # Reorder recommendations based on GPT ranking
-            id_to_item = {item.id: item for item in recommendations}
-            enhanced_recommendations = []
-            
-            # Add ranked items first
-            for product_id in ranked_ids:
-                if product_id in id_to_item:
-                    enhanced_recommendations.append(id_to_item[product_id])
-            
-            # Add any remaining items
-            for item in recommendations:
-                if item not in enhanced_recommendations:
-                    enhanced_recommendations.append(item)
+            # A malformed reply would be served to every near-duplicate prompt for the whole TTL
+            if (
+                ranking_key_text is not None and isinstance(ranked_ids, list) and ranked_ids
+                and all(isinstance(product_id, str) for product_id in ranked_ids)
+            ):
+                self._cache_ranking(ranking_key_text, ranking_key, ranking_scope, ranked_ids)
             
             logger.info(f"Enhanced recommendations ranking with GPT-4o mini")
-            return enhanced_recommendations
+            return self._apply_ranking(recommendations, ranked_ids)
             
         except Exception as e:
             logger.error(f"Error enhancing recommendations: {e}")
             return recommendations  # Return original order on error
     
+    def _cache_ranking(
+        self,
+        key_text: str,
+        key: Optional[List[float]],
+        scope: Hashable,
+        ranked_ids: List[str]
+    ) -> None:
+        """
+        Cache a ranking, embedding its key off the request path when the lookup didn't already
+        """
+        if key is not None:
+            self._ranking_cache.store(key, scope, ranked_ids)
+            return
+        
+        task = asyncio.create_task(self._store_ranking(key_text, scope, ranked_ids))
+        self._ranking_stores.add(task)
+        task.add_done_callback(self._ranking_stores.discard)
+    
+    async def _store_ranking(self, key_text: str, scope: Hashable, ranked_ids: List[str]) -> None:
+        try:
+            key = await self.get_query_embedding(key_text)
+        except Exception as e:
+            logger.warning(f"Ranking cache key embedding failed, not caching ranking: {e}")
+            return
+        self._ranking_cache.store(key, scope, ranked_ids)
+    
+    @staticmethod
+    def _apply_ranking(recommendations: List[ProductItem], ranked_ids: List[str]) -> List[ProductItem]:
+        """
+        Ranked items first, in ranking order, followed by the rest in their original order
+        """
+        id_to_item = {item.id: item for item in recommendations}
+        enhanced_recommendations = []
+        seen_ids = set()
+        
+        # Add ranked items first
+        for product_id in ranked_ids:
+            if product_id in id_to_item and product_id not in seen_ids:
+                enhanced_recommendations.append(id_to_item[product_id])
+                seen_ids.add(product_id)
+        
+        # Add any remaining items
+        for item in recommendations:
+            if item.id not in seen_ids:
+                enhanced_recommendations.append(item)
+                seen_ids.add(item.id)
+        return enhanced_recommendations
+    
+    def message_updates_context(self, message: str) -> bool:
+        """
+        Whether a chat message talks about preferences that change the shopping context
+        Depends only on the user's message, so it is known before the reply is generated
+        """
+        return _CHAT_CONTEXT_RE.search(message) is not None
+    
     async def chat_with_assistant(
         self, 
         message: str, 
@@ -331,34 +778,72 @@ Focus on actionable details that would help find similar clothing items."""
         Chat with GPT-4o mini assistant about fashion and recommendations
         Returns (response_message, context_updated)
         """
-        system_prompt = """You are Ray, a world-class fashion stylist and color expert with years of experience in high-end fashion. You're passionate about helping people discover their personal style and feel confident in their clothing choices.
-
-        Your expertise includes:
-        - Color theory and seasonal color analysis
-        - Style archetypes and body type recommendations  
-        - Fashion trends and timeless pieces
-        - Accessory coordination and styling
-        - Fabric knowledge and garment construction
-        - Occasion-appropriate dressing
-        - Mix-and-match outfit creation
-        - Personal shopping and wardrobe building
-
-        Guidelines for your responses:
-        - Be enthusiastic and encouraging about fashion
-        - Provide specific, actionable styling advice
-        - Reference color theory when discussing color combinations
-        - Suggest outfit formulas and styling tricks
-        - Mention specific brands or style inspirations when relevant
-        - Ask clarifying questions to better understand their needs
-        - Use fashion terminology appropriately but explain when needed
-        - Be inclusive and body-positive in all recommendations
-        - Focus on building confidence through great style choices
-        - Reference their current recommendations and preferences from context
-
-        Tone: Warm, knowledgeable, enthusiastic, and supportive - like a trusted friend who happens to be a fashion expert."""
+        messages = self._build_chat_messages(message, context, history)
+        
+        try:
+            response = await self.client.chat.completions.create(
+                model=settings.gpt_model,
+                messages=messages,
+                max_tokens=400,  # Increased for more detailed fashion advice
+                temperature=0.8  # Slightly higher for more creative styling suggestions
+            )
+            
+            assistant_response = response.choices[0].message.content.strip()
+            
+            logger.info("Generated fashion expert chat response")
+            return assistant_response, self.message_updates_context(message)
+            
+        except Exception as e:
+            logger.error(f"Error in fashion chat completion: {e}")
+            return CHAT_FALLBACK_MESSAGE, False
+    
+    async def stream_chat_with_assistant(
+        self,
+        message: str,
+        context: Dict[str, Any],
+        history: List[ChatMessage]
+    ) -> AsyncIterator[str]:
+        """
+        Same conversation as chat_with_assistant, yielding reply text as the model generates it
+        Yields the fallback message instead if the request fails before any text was sent
+        """
+        messages = self._build_chat_messages(message, context, history)
+        sent_any = False
         
+        try:
+            stream = await self.client.chat.completions.create(
+                model=settings.gpt_model,
+                messages=messages,
+                max_tokens=400,
+                temperature=0.8,
+                stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    sent_any = True
+                    yield delta
+            
+            logger.info("Streamed fashion expert chat response")
+            
+        except Exception as e:
+            logger.error(f"Error in streamed fashion chat completion: {e}")
+            if not sent_any:
+                yield CHAT_FALLBACK_MESSAGE
+    
+    def _build_chat_messages(
+        self,
+        message: str,
+        context: Dict[str, Any],
+        history: List[ChatMessage]
+    ) -> List[Dict[str, str]]:
+        """
+        System prompt, rendered context, trimmed history and the new user message
+        """
         # Prepare conversation history
-        messages = [{"role": "system", "content": system_prompt}]
+        messages = [_CHAT_SYSTEM_MSG]
         
         # Build comprehensive context information
         context_parts = []
@@ -416,8 +901,8 @@ Focus on actionable details that would help find similar clothing items."""
                         context_parts.append(f"  ... and {len(recs) - 5} more items available")
                         
                     # Add styling insights
-                    colors_in_recs = [rec.get('color', '') for rec in recs if rec.get('color')]
-                    unique_colors = list(set([c for c in colors_in_recs if c]))
+                    # First-seen order keeps the context text identical across turns
+                    unique_colors = list(dict.fromkeys(rec['color'] for rec in recs if rec.get('color')))
                     if unique_colors:
                         context_parts.append(f"Color palette in recommendations: {', '.join(unique_colors[:5])}")
 
@@ -438,114 +923,42 @@ Focus on actionable details that would help find similar clothing items."""
             context_msg = "\n".join(context_parts)
             messages.append({"role": "system", "content": f"Current Context:\n{context_msg}\n\nUse this information to provide personalized fashion advice."})
         
-        # Add conversation history (last 8 messages for better context)
-        for msg in history[-8:]:
+        # Add conversation history, newest turns first until the token budget is spent
+        for msg in trim_history_to_budget(history, settings.chat_history_token_budget):
             messages.append({"role": msg.role, "content": msg.content})
         
         # Add current message
         messages.append({"role": "user", "content": message})
-        
-        try:
-            response = await self.client.chat.completions.create(
-                model=settings.gpt_model,
-                messages=messages,
-                max_tokens=400,  # Increased for more detailed fashion advice
-                temperature=0.8  # Slightly higher for more creative styling suggestions
-            )
-            
-            assistant_response = response.choices[0].message.content.strip()
-            
-            # Enhanced context update detection for fashion-related changes
-            fashion_keywords = [
-                "prefer", "like", "want", "looking for", "change", "update", "style", "color",
-                "outfit", "occasion", "budget", "size", "fit", "trend", "classic", "formal",
-                "casual", "work", "party", "date", "wedding", "travel"
-            ]
-            context_updated = any(keyword in message.lower() for keyword in fashion_keywords)
-            
-            logger.info("Generated fashion expert chat response")
-            return assistant_response, context_updated
-            
-        except Exception as e:
-            logger.error(f"Error in fashion chat completion: {e}")
-            return "I'm sorry, I'm having trouble with my styling advice right now. Please try again in a moment!", False
+        return messages
     
     @openai_retry
     async def analyze_user_selfie(self, user_image_b64: str) -> Dict[str, Any]:
         """
         Enhanced analysis of user's selfie with GPT-4o Vision for high-fidelity virtual try-on
         Extracts detailed characteristics to preserve person's identity in generated images
+        Results are cached by image hash so repeated try-ons with one selfie skip the vision call,
+        and concurrent try-ons with an uncached selfie share one analysis
         """
-        system_prompt = """You are a professional portrait photographer and facial analysis expert. Analyze this person's photo with extreme detail to preserve their exact appearance in virtual try-on generation.
-
-        Focus on capturing:
-        1. FACIAL FEATURES: Exact details that make this person unique
-        2. PHYSICAL CHARACTERISTICS: Body type, posture, distinctive features  
-        3. POSE & EXPRESSION: Head angle, body position, facial expression
-        4. LIGHTING & ENVIRONMENT: Light direction, intensity, background
-        5. PHOTOGRAPHY STYLE: Camera angle, framing, aesthetic
-
-        Be extremely specific - these details will be used to recreate this exact person in AI-generated images."""
-
-        user_prompt = """Analyze this person's selfie with maximum detail for virtual try-on generation. I need to preserve their exact appearance when showing them wearing different clothes.
-
-        Return detailed JSON with specific descriptive terms:
-        {
-            "facial_features": {
-                "face_shape": "oval/round/square/heart/diamond",
-                "eye_color": "specific color",
-                "eye_shape": "almond/round/hooded etc",
-                "eyebrow_style": "thick/thin/arched etc",
-                "nose_shape": "straight/button/aquiline etc",
-                "lip_shape": "full/thin/bow-shaped etc",
-                "skin_tone": "fair/medium/olive/dark with undertones",
-                "distinctive_features": "freckles/dimples/moles/scars etc"
-            },
-            "hair_details": {
-                "color": "exact color description",
-                "style": "short/long/curly/straight/wavy",
-                "texture": "fine/thick/coarse",
-                "length": "specific length description"
-            },
-            "physical_build": {
-                "body_type": "petite/average/tall/athletic etc",
-                "build": "slim/average/curvy/muscular etc",
-                "posture": "straight/relaxed/confident etc"
-            },
-            "pose_and_expression": {
-                "head_angle": "straight/tilted left/right",
-                "body_orientation": "facing camera/3-quarter turn etc",
-                "facial_expression": "smiling/serious/neutral etc",
-                "eye_contact": "direct/looking away etc"
-            },
-            "lighting_and_setting": {
-                "lighting_type": "natural/artificial/studio",
-                "light_direction": "front/side/top",
-                "lighting_quality": "soft/harsh/diffused",
-                "background": "plain/indoor/outdoor/textured",
-                "background_color": "specific color if visible",
-                "overall_mood": "bright/moody/professional etc"
-            },
-            "photography_style": {
-                "camera_angle": "eye level/slightly above/below",
-                "framing": "headshot/bust/full body",
-                "photo_quality": "professional/casual/phone selfie",
-                "image_sharpness": "crisp/soft/slightly blurred"
-            },
-            "age_range": "specific age estimate",
-            "gender_presentation": "masculine/feminine/androgynous",
-            "overall_vibe": "confident/casual/professional/artistic etc"
-        }"""
+        image_hash = await asyncio.to_thread(_image_hash, user_image_b64)
+        cached_analysis = self._selfie_desc_cache.get(image_hash)
+        if cached_analysis is not None:
+            logger.info("Using cached selfie analysis")
+            return cached_analysis
 
+        return await self._single_flight.run(
+            ("selfie", image_hash), lambda: self._analyze_user_selfie(user_image_b64, image_hash)
+        )
+    
+    async def _analyze_user_selfie(self, user_image_b64: str, image_hash: bytes) -> Dict[str, Any]:
         try:
             response = await self.client.chat.completions.create(
                 model="gpt-4o",  # Use GPT-4o for vision analysis
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    _SELFIE_SYSTEM_MSG,
                     {
                         "role": "user", 
                         "content": [
-                            {"type": "text", "text": user_prompt},
+                            {"type": "text", "text": _SELFIE_USER_PROMPT},
                             {
                                 "type": "image_url",
                                 "image_url": {"url": f"data:image/jpeg;base64,{user_image_b64}"}
@@ -558,8 +971,9 @@ Focus on actionable details that would help find similar clothing items."""
                 response_format={"type": "json_object"}
             )
             
-            analysis = json.loads(response.choices[0].message.content)
+            analysis = _json_loads(response.choices[0].message.content)
             logger.info("Enhanced user selfie analysis completed with detailed characteristics")
+            self._selfie_desc_cache.set(image_hash, analysis)
             return analysis
             
         except Exception as e:
@@ -606,71 +1020,32 @@ Focus on actionable details that would help find similar clothing items."""
         """
         Analyze the actual product image to get precise visual details for virtual try-on
         This replaces generic text descriptions with actual visual analysis
+        Analyses are cached per product image, and concurrent requests for one image share a call
         """
         if not product_item.image_url:
             logger.warning(f"No image URL for product {product_item.id}")
             return self._get_fallback_product_description(product_item)
 
-        system_prompt = """You are a fashion expert and product photographer. Analyze this clothing item image with extreme detail for virtual try-on generation.
+        cache_key = (product_item.id, product_item.image_url)
+        cached_analysis = self._product_analysis_cache.get(cache_key)
+        if cached_analysis is not None:
+            logger.info(f"Using cached product image analysis for {product_item.id}")
+            return cached_analysis
 
-        Focus on:
-        1. EXACT VISUAL APPEARANCE: Colors, patterns, textures, materials
-        2. GARMENT CONSTRUCTION: Cut, fit, silhouette, design details
-        3. STYLING ELEMENTS: Necklines, sleeves, hemlines, closures
-        4. FABRIC CHARACTERISTICS: Drape, structure, weight, finish
-        5. DESIGN DETAILS: Buttons, zippers, embellishments, prints
-
-        Be extremely specific about what you see - this will be used to recreate this exact item on a person."""
-
-        user_prompt = """Analyze this clothing item image in detail for virtual try-on generation. I need to accurately show this exact item being worn by someone.
-
-        Return detailed JSON:
-        {
-            "item_type": "specific garment type",
-            "visual_description": {
-                "primary_color": "exact color name and shade",
-                "secondary_colors": ["any accent colors"],
-                "pattern": "solid/striped/floral/geometric/etc",
-                "pattern_details": "specific pattern description if any",
-                "fabric_type": "cotton/silk/denim/knit/etc",
-                "fabric_texture": "smooth/textured/ribbed/etc",
-                "fabric_weight": "lightweight/medium/heavy",
-                "fabric_finish": "matte/shiny/satin/etc"
-            },
-            "garment_details": {
-                "silhouette": "fitted/loose/oversized/tailored/etc",
-                "neckline": "crew/v-neck/scoop/high-neck/etc",
-                "sleeve_type": "short/long/sleeveless/3-quarter/etc",
-                "sleeve_style": "fitted/loose/bell/etc",
-                "hemline": "cropped/regular/long/etc",
-                "closure_type": "buttons/zipper/pullover/etc",
-                "fit_style": "slim/regular/relaxed/oversized"
-            },
-            "design_elements": {
-                "embellishments": "buttons/sequins/embroidery/none",
-                "hardware": "zippers/buckles/grommets/none",
-                "special_features": "pockets/hood/collar/etc",
-                "trim_details": "piping/contrast stitching/etc"
-            },
-            "styling_context": {
-                "formality_level": "casual/business casual/formal/etc",
-                "season": "spring/summer/fall/winter/year-round",
-                "occasion": "everyday/work/party/etc",
-                "styling_suggestions": "how this item typically fits and drapes"
-            },
-            "brand_style": "if visible, brand aesthetic",
-            "overall_vibe": "classic/trendy/edgy/romantic/etc"
-        }"""
+        return await self._single_flight.run(
+            ("product", cache_key), lambda: self._analyze_product_image(product_item, cache_key)
+        )
 
+    async def _analyze_product_image(self, product_item: ProductItem, cache_key: Tuple[str, str]) -> Dict[str, Any]:
         try:
             response = await self.client.chat.completions.create(
                 model="gpt-4o",  # Use GPT-4o for vision analysis
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    _PRODUCT_SYSTEM_MSG,
                     {
                         "role": "user", 
                         "content": [
-                            {"type": "text", "text": user_prompt},
+                            {"type": "text", "text": _PRODUCT_USER_PROMPT},
                             {
                                 "type": "image_url",
                                 "image_url": {"url": product_item.image_url}
@@ -683,14 +1058,88 @@ Focus on actionable details that would help find similar clothing items."""
                 response_format={"type": "json_object"}
             )
             
-            analysis = json.loads(response.choices[0].message.content)
+            analysis = _json_loads(response.choices[0].message.content)
             logger.info(f"Detailed product image analysis completed for {product_item.id}")
+            self._product_analysis_cache.set(cache_key, analysis)
             return analysis
             
         except Exception as e:
             logger.error(f"Error analyzing product image for {product_item.id}: {e}")
             return self._get_fallback_product_description(product_item)
 
+    async def analyze_product_images_batch(
+        self,
+        product_items: List[ProductItem],
+        chunk_size: int = 8
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyses for several product images, keyed by product id
+        Uncached images are analyzed up to chunk_size per GPT-4o call, sharing one prompt and round-trip;
+        results are cached like single analyses, and any image a call leaves out is analyzed on its own
+        """
+        analyses: Dict[str, Dict[str, Any]] = {}
+        pending: Dict[Tuple[str, str], ProductItem] = {}
+        for product_item in product_items:
+            if not product_item.image_url:
+                analyses[product_item.id] = self._get_fallback_product_description(product_item)
+                continue
+            cache_key = (product_item.id, product_item.image_url)
+            cached_analysis = self._product_analysis_cache.get(cache_key)
+            if cached_analysis is not None:
+                analyses[product_item.id] = cached_analysis
+            else:
+                pending[cache_key] = product_item
+        
+        pending_items = list(pending.values())
+        chunks = [pending_items[i:i + chunk_size] for i in range(0, len(pending_items), chunk_size)]
+        await asyncio.gather(*(self._analyze_product_image_chunk(chunk) for chunk in chunks))
+        
+        leftovers = []
+        for product_item in pending_items:
+            cached_analysis = self._product_analysis_cache.get((product_item.id, product_item.image_url))
+            if cached_analysis is not None:
+                analyses[product_item.id] = cached_analysis
+            else:
+                leftovers.append(product_item)
+        if leftovers:
+            results = await asyncio.gather(*(self.analyze_product_image(item) for item in leftovers))
+            for product_item, analysis in zip(leftovers, results):
+                analyses[product_item.id] = analysis
+        return analyses
+
+    async def _analyze_product_image_chunk(self, product_items: List[ProductItem]) -> None:
+        """
+        One multi-image call for a chunk of products, caching each analysis it returns
+        """
+        content = [{
+            "type": "text",
+            "text": f"""{_PRODUCT_USER_PROMPT}
+
+        There are {len(product_items)} clothing item images, numbered 1 to {len(product_items)} in the order given.
+        Return one JSON object mapping each image number (as a string) to that item's analysis in the format above."""
+        }]
+        for product_item in product_items:
+            content.append({"type": "image_url", "image_url": {"url": product_item.image_url}})
+        
+        try:
+            response = await self.client.chat.completions.create(
+                model="gpt-4o",  # Use GPT-4o for vision analysis
+                messages=[_PRODUCT_SYSTEM_MSG, {"role": "user", "content": content}],
+                max_tokens=600 * len(product_items),
+                temperature=0.1,
+                response_format={"type": "json_object"}
+            )
+            analyses = _json_loads(response.choices[0].message.content)
+        except Exception as e:
+            logger.error(f"Error analyzing {len(product_items)} product images together: {e}")
+            return
+        
+        for number, product_item in enumerate(product_items, start=1):
+            analysis = analyses.get(str(number)) if isinstance(analyses, dict) else None
+            if isinstance(analysis, dict):
+                self._product_analysis_cache.set((product_item.id, product_item.image_url), analysis)
+        logger.info(f"Analyzed {len(product_items)} product images in one call")
+
     def _get_fallback_product_description(self, product_item: ProductItem) -> Dict[str, Any]:
         """Fallback product description when image analysis fails"""
         return {
@@ -711,27 +1160,122 @@ Focus on actionable details that would help find similar clothing items."""
             "overall_vibe": "stylish and comfortable"
         }
 
+    async def generate_virtual_tryons_batch(
+        self,
+        user_image_b64: str,
+        product_items: List[ProductItem],
+        style_prompt: str = None,
+        hd: bool = False
+    ) -> List[Optional[Tuple[str, str]]]:
+        """
+        Virtual try-ons of several products for one selfie, generated concurrently
+        The selfie is analyzed once (cached and coalesced by image hash) and shared by every product
+        Returns (image_url, generation_prompt) per product, None where generation failed
+        """
+        # Warm the vision caches first: the selfie once, and the product images in shared multi-image calls.
+        # Failures here are left for each try-on to retry and report on its own
+        await asyncio.gather(
+            self.analyze_user_selfie(user_image_b64),
+            self.analyze_product_images_batch(product_items),
+            return_exceptions=True
+        )
+        
+        results = await asyncio.gather(
+            *(self.generate_virtual_tryon(user_image_b64, product_item, style_prompt, hd) for product_item in product_items),
+            return_exceptions=True
+        )
+        
+        tryons = []
+        for product_item, result in zip(product_items, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Virtual try-on failed for product {product_item.id}: {result}")
+                tryons.append(None)
+            else:
+                tryons.append(result)
+        return tryons
+    
+    @openai_retry
+    async def generate_virtual_tryon_grid(
+        self,
+        user_image_b64: str,
+        product_items: List[ProductItem],
+        style_prompt: str = None,
+        hd: bool = False
+    ) -> Tuple[str, str]:
+        """
+        One image showing the user in each product as a panel, in product order
+        A single DALL-E call instead of one per product; panels are described from product metadata,
+        so only the (cached) selfie analysis is needed
+        Returns (image_url, generation_prompt)
+        """
+        if len(product_items) not in TRYON_GRID_LAYOUTS:
+            raise ValueError(f"Try-on grids hold 2 to {TRYON_GRID_MAX_PRODUCTS} products, got {len(product_items)}")
+        
+        user_analysis = await self.analyze_user_selfie(user_image_b64)
+        
+        person_desc = "the same person"
+        facial = user_analysis.get("facial_features") or {}
+        hair = user_analysis.get("hair_details") or {}
+        traits = [
+            f"{facial['skin_tone']} skin" if facial.get("skin_tone") else "",
+            f"{facial['eye_color']} eyes" if facial.get("eye_color") else "",
+            f"{hair.get('color', '')} {hair.get('style', '')} hair".strip() if hair else ""
+        ]
+        traits = [trait for trait in traits if trait]
+        if traits:
+            person_desc += f" ({', '.join(traits)})"
+        
+        layout, positions = TRYON_GRID_LAYOUTS[len(product_items)]
+        panels = "; ".join(
+            f"({position}) wearing {product_item.name} in {product_item.color}"
+            for position, product_item in zip(positions, product_items)
+        )
+        prompt_parts = [
+            f"A {layout} of {person_desc}, one outfit per panel: {panels}",
+            "identical face, hair and pose in every panel, clean plain background",
+            "high-quality portrait photography, photorealistic, sharp focus"
+        ]
+        if style_prompt:
+            prompt_parts.append(style_prompt)
+        full_prompt = ", ".join(prompt_parts)
+        
+        response = await self.client.images.generate(
+            model="dall-e-3",
+            prompt=full_prompt,
+            size="1024x1024",
+            quality="hd" if hd else "standard",
+            style="natural",
+            n=1
+        )
+        
+        image_url = response.data[0].url
+        logger.info(f"Generated virtual try-on grid for {len(product_items)} products")
+        return image_url, full_prompt
+    
     @openai_retry
     async def generate_virtual_tryon(
         self, 
         user_image_b64: str, 
         product_item: ProductItem,
-        style_prompt: str = None
+        style_prompt: str = None,
+        hd: bool = False
     ) -> Tuple[str, str]:
         """
         Generate ultra-high-fidelity virtual try-on using detailed analysis of both user and product
+        Images are generated at standard quality unless hd is requested, which roughly doubles cost and latency
         Returns (image_url, generation_prompt)
         """
+        user_analysis = None
         try:
             logger.info(f"Starting enhanced virtual try-on generation for product {product_item.id}")
             
-            # Step 1: Detailed analysis of user's selfie
-            logger.info("Analyzing user selfie with enhanced detail...")
-            user_analysis = await self.analyze_user_selfie(user_image_b64)
-            
-            # Step 2: Detailed analysis of product image
-            logger.info("Analyzing product image for exact visual details...")
-            product_analysis = await self.analyze_product_image(product_item)
+            # Steps 1-2: Detailed analysis of user's selfie and product image
+            # The two vision calls are independent, so run them concurrently
+            logger.info("Analyzing user selfie and product image concurrently...")
+            user_analysis, product_analysis = await asyncio.gather(
+                self.analyze_user_selfie(user_image_b64),
+                self.analyze_product_image(product_item)
+            )
             
             # Step 3: Construct ultra-detailed DALL-E prompt
             prompt_parts = []
@@ -875,7 +1419,7 @@ Focus on actionable details that would help find similar clothing items."""
                 model="dall-e-3",
                 prompt=full_prompt,
                 size="1024x1024",
-                quality="hd",  # Use HD quality for maximum realism
+                quality="hd" if hd else "standard",
                 style="natural",  # Natural style for photorealistic results
                 n=1
             )
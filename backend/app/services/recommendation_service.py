@@ -1,11 +1,13 @@
+import asyncio
 import uuid
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from app.services.vector_service import VectorSearchService
 from app.services.openai_service import OpenAIService
 from app.models.requests import UserProfile, RecommendationRequest, FilterOptions
 from app.models.responses import ProductItem, RecommendationResponse, RecommendationResponseV2, CategoryResult, DebugInfo
 from app.utils.logging import get_logger
+from app.services.session_store import SessionStore
 from app.config import settings
 
 logger = get_logger(__name__)
@@ -14,6 +16,8 @@ class RecommendationService:
     def __init__(self):
         self.vector_service = VectorSearchService()
         self.openai_service = OpenAIService()
+        # One OpenAI service per process, so index builds share its client, embedding cache and in-flight calls
+        self.vector_service.openai_service = self.openai_service
         
         # Initialize CompletionService with error handling
         self.completion_service = None
@@ -25,10 +29,8 @@ class RecommendationService:
             logger.warning(f"⚠️ CompletionService initialization failed: {e}")
             logger.warning("Complete the Look feature will be disabled")
         
-        self.session_cache: Dict[str, Dict] = {}  # In-memory session storage with TTL
-        self.session_ttl = 3600  # 1 hour TTL for sessions
-        self.last_cleanup = time.time()
-        self.cleanup_interval = 300  # Cleanup every 5 minutes
+        # Session storage: Redis when configured, bounded in-process TTL cache otherwise
+        self.session_store = SessionStore()
         
     async def initialize(self) -> bool:
         """
@@ -42,51 +44,22 @@ class RecommendationService:
             logger.error("Failed to initialize recommendation service")
         return success
     
-    def _cleanup_expired_sessions(self) -> None:
+    async def _store_session_data(self, session_id: str, data: Dict[str, Any]) -> None:
         """
-        Remove expired sessions from cache to prevent memory leaks
+        Store session data, restarting its TTL
         """
-        current_time = time.time()
-        
-        # Only cleanup if interval has passed
-        if current_time - self.last_cleanup < self.cleanup_interval:
-            return
-            
-        expired_sessions = []
-        for session_id, session_data in self.session_cache.items():
-            session_time = session_data.get('created_at', 0)
-            if current_time - session_time > self.session_ttl:
-                expired_sessions.append(session_id)
-        
-        # Remove expired sessions
-        for session_id in expired_sessions:
-            del self.session_cache[session_id]
-            
-        if expired_sessions:
-            logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
-            
-        self.last_cleanup = current_time
-    
-    def _store_session_data(self, session_id: str, data: Dict[str, Any]) -> None:
-        """
-        Store session data with timestamp for TTL cleanup
-        """
-        self._cleanup_expired_sessions()  # Cleanup before storing
-        
         data['created_at'] = time.time()
         data['last_accessed'] = time.time()
-        self.session_cache[session_id] = data
+        await self.session_store.set(session_id, data)
     
-    def _get_session_data(self, session_id: str) -> Optional[Dict[str, Any]]:
+    async def _get_session_data(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
         Get session data and update last accessed time
         """
-        self._cleanup_expired_sessions()  # Cleanup before accessing
-        
-        if session_id in self.session_cache:
-            self.session_cache[session_id]['last_accessed'] = time.time()
-            return self.session_cache[session_id]
-        return None
+        session_data = await self.session_store.get(session_id)
+        if session_data is not None:
+            session_data['last_accessed'] = time.time()
+        return session_data
 
     async def get_recommendations(self, request: RecommendationRequest) -> RecommendationResponse:
         """
@@ -98,6 +71,18 @@ class RecommendationService:
         5. Enhance ranking with GPT-4o mini
         6. Return top-k results
         """
+        response = None
+        async for stage, payload in self.iter_recommendations(request):
+            if stage == "final":
+                response = payload
+        return response
+
+    async def iter_recommendations(self, request: RecommendationRequest) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Run the recommendation pipeline, yielding progressive stages:
+        - ("vector", List[ProductItem]) as soon as vector search completes
+        - ("final", RecommendationResponse) once GPT ranking is applied
+        """
         try:
             session_id = request.session_id or str(uuid.uuid4())
             logger.info(f"Processing recommendation request for session {session_id}")
@@ -179,7 +164,7 @@ class RecommendationService:
                     logger.info(f"DEBUG: {user_type} -> {mapped_types}")
                 
                 # Get items for each preferred article type separately
-                all_recommendations = []
+                category_results = []
                 for user_article_type in user_profile.preferred_article_types:
                     # Map to database article types
                     db_article_types = map_article_type(user_article_type)
@@ -214,13 +199,27 @@ class RecommendationService:
                     else:
                         logger.warning(f"DEBUG: NO PRODUCTS FOUND for {user_article_type} with filter {db_article_types}")
                     
-                    # Enhance recommendations for this category
-                    enhanced_category_items = await self.openai_service.enhance_recommendations(
+                    category_results.append((user_article_type, category_items))
+                
+                # Emit raw vector results before the slower GPT ranking
+                yield "vector", [
+                    item
+                    for _, category_items in category_results
+                    for item in category_items[:request.items_per_category]
+                ]
+                
+                # Categories are ranked independently, so their GPT calls run concurrently
+                enhanced_results = await asyncio.gather(*(
+                    self.openai_service.enhance_recommendations(
                         user_profile=user_profile,
                         recommendations=category_items,
                         inspiration_analysis=inspiration_analysis
                     )
-                    
+                    for _, category_items in category_results
+                ))
+                
+                all_recommendations = []
+                for (user_article_type, _), enhanced_category_items in zip(category_results, enhanced_results):
                     # Limit to requested number per category
                     final_category_items = enhanced_category_items[:request.items_per_category]
                     all_recommendations.extend(final_category_items)
@@ -245,6 +244,9 @@ class RecommendationService:
                 # Step 6: Extract product items from search results
                 product_items = [result[0] for result in search_results]
                 
+                # Emit raw vector results before the slower GPT ranking
+                yield "vector", product_items[:request.top_k]
+                
                 # Step 7: Enhance recommendations with GPT-4o mini for better ranking
                 final_recommendations = await self.openai_service.enhance_recommendations(
                     user_profile=user_profile,
@@ -258,19 +260,19 @@ class RecommendationService:
             
             # Step 8: Cache session data for future requests (with TTL)
             session_data = {
-                "user_profile": user_profile.dict(),
+                "user_profile": user_profile.model_dump(mode="json"),
                 "query_embedding": query_embedding,
                 "search_query": search_query,
                 "inspiration_analysis": inspiration_analysis,
                 "exclude_ids": exclude_ids,
-                "current_recommendations": [item.dict() for item in final_recommendations],
+                "current_recommendations": [item.model_dump(mode="json") for item in final_recommendations],
                 "user_interactions": {
                     "liked": [],
                     "disliked": [],
                     "saved": []
                 }
             }
-            self._store_session_data(session_id, session_data)
+            await self._store_session_data(session_id, session_data)
             
             # Step 9: Create response
             response = RecommendationResponse(
@@ -281,7 +283,7 @@ class RecommendationService:
             )
             
             logger.info(f"Generated {len(final_recommendations)} recommendations for session {session_id}")
-            return response
+            yield "final", response
             
         except Exception as e:
             logger.error(f"Error generating recommendations: {e}")
@@ -299,7 +301,7 @@ class RecommendationService:
         """
         try:
             # Get session data
-            session_data = self._get_session_data(session_id)
+            session_data = await self._get_session_data(session_id)
             if not session_data:
                 raise ValueError(f"Session {session_id} not found")
             
@@ -321,7 +323,7 @@ class RecommendationService:
             
             # Update session cache with new excludes
             session_data["exclude_ids"] = all_exclude_ids
-            self._store_session_data(session_id, session_data)
+            await self._store_session_data(session_id, session_data)
             
             logger.info(f"Generated {len(fresh_items)} fresh recommendations for session {session_id}")
             return fresh_items
@@ -354,7 +356,7 @@ class RecommendationService:
             }
 
             # Update session cache with user interactions
-            session_data = self._get_session_data(session_id)
+            session_data = await self._get_session_data(session_id)
             if session_data is not None:
                 interactions = session_data.setdefault("user_interactions", {"liked": [], "disliked": [], "saved": []})
                 if action == "like":
@@ -376,7 +378,7 @@ class RecommendationService:
                         interactions["saved"].append(product_id)
                 
                 # Update session data with new interactions
-                self._store_session_data(session_id, session_data)
+                await self._store_session_data(session_id, session_data)
             
             response = {"success": True, "message": f"Feedback '{action}' recorded"}
             
@@ -398,24 +400,51 @@ class RecommendationService:
             logger.error(f"Error processing feedback: {e}")
             raise
     
-    def get_session_context(self, session_id: str) -> Optional[Dict[str, Any]]:
+    async def fork_session(self, source_session_id: str, target_session_id: str) -> bool:
+        """
+        Seed a new session from an existing one so a cached response can be served
+        with its own session (fresh interactions and excludes)
+        """
+        source_data = await self._get_session_data(source_session_id)
+        if source_data is None:
+            return False
+
+        if source_session_id == target_session_id:
+            return True
+
+        session_data = {
+            "user_profile": source_data["user_profile"],
+            "query_embedding": source_data["query_embedding"],
+            "search_query": source_data.get("search_query"),
+            "inspiration_analysis": source_data.get("inspiration_analysis"),
+            "exclude_ids": [],
+            "current_recommendations": list(source_data.get("current_recommendations", [])),
+            "user_interactions": {
+                "liked": [],
+                "disliked": [],
+                "saved": []
+            }
+        }
+        await self._store_session_data(target_session_id, session_data)
+        return True
+
+    async def get_session_context(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
         Get session context for chat functionality
         """
-        return self._get_session_data(session_id)
+        return await self._get_session_data(session_id)
     
     def get_service_status(self) -> Dict[str, Any]:
         """
         Get service status for health checks
         """
-        self._cleanup_expired_sessions()  # Cleanup before reporting status
-        
         return {
             "vector_store_loaded": self.vector_service.index is not None,
             "fallback_mode": self.vector_service.is_fallback_mode(),
             "total_products": self.vector_service.get_total_products(),
-            "active_sessions": len(self.session_cache),
-            "session_ttl_hours": self.session_ttl / 3600
+            "active_sessions": self.session_store.count_local(),
+            "session_backend": self.session_store.backend,
+            "session_ttl_hours": self.session_store.ttl_sec / 3600
         }
 
     async def get_recommendations_v2(self, request: RecommendationRequest) -> RecommendationResponseV2:
@@ -476,7 +505,10 @@ class RecommendationService:
                 query_embedding = None
             
             # Search each category individually (like V1)
-            for category in user_categories:
+            async def search_category(category: str) -> Tuple[CategoryResult, bool]:
+                """
+                Search, rank and package one category; returns the result and whether it found items
+                """
                 category_start = time.time()
                 
                 try:
@@ -532,29 +564,35 @@ class RecommendationService:
                     
                     category_time = int((time.time() - category_start) * 1000)
                     
-                    result.categories[category] = CategoryResult(
-                        items=final_items,
-                        total_available=len(final_items),
-                        requested_count=request.items_per_category or 20,
-                        search_time_ms=category_time
-                    )
-                    
                     if final_items:
-                        result.debug_info.categories_found.append(category)
                         logger.info(f"V2 API: Successfully found {len(final_items)} items for category '{category}' in {category_time}ms")
                     else:
-                        result.debug_info.categories_missing.append(category)
                         logger.warning(f"V2 API: No items found for category '{category}'")
+                    
+                    return CategoryResult(
+                        items=final_items,
+                        total_available=len(final_items),
+                        requested_count=request.items_per_category or 20,
+                        search_time_ms=category_time
+                    ), bool(final_items)
                         
                 except Exception as category_error:
                     logger.error(f"V2 API: Error searching category '{category}': {category_error}")
                     # Still add empty category to maintain structure
-                    result.categories[category] = CategoryResult(
+                    return CategoryResult(
                         items=[],
                         total_available=0,
                         requested_count=request.items_per_category or 20,
                         search_time_ms=int((time.time() - category_start) * 1000)
-                    )
+                    ), False
+            
+            # Categories are searched and ranked concurrently, then recorded in request order
+            category_outcomes = await asyncio.gather(*(search_category(category) for category in user_categories))
+            for category, (category_result, found) in zip(user_categories, category_outcomes):
+                result.categories[category] = category_result
+                if found:
+                    result.debug_info.categories_found.append(category)
+                else:
                     result.debug_info.categories_missing.append(category)
             
             # Calculate totals
@@ -650,21 +688,24 @@ class RecommendationService:
                 for category_name, category_data in result.categories.items()
             }
             
-            complete_looks_generated = 0
+            # Score every item against the other categories in one batched pass
+            base_items = [
+                item for category_data in result.categories.values() for item in category_data.items
+            ]
+            complete_looks = self.completion_service.generate_complete_look_batch(
+                base_items=base_items,
+                all_categories=all_items_by_category,
+                user_profile=user_profile
+            )
             
-            # Generate complete looks for each item
-            for category_name, category_data in result.categories.items():
-                for item in category_data.items:
-                    # Generate complete look using CompletionService
-                    complete_look = self.completion_service.generate_complete_look(
-                        base_item=item,
-                        all_categories=all_items_by_category,
-                        user_profile=user_profile
-                    )
-                    
+            complete_looks_generated = 0
+            looks = iter(complete_looks)
+            for category_data in result.categories.values():
+                for index, item in enumerate(category_data.items):
+                    complete_look = next(looks)
                     # Only assign if we got a valid complete look
                     if complete_look:
-                        item.complete_the_look = complete_look
+                        category_data.items[index] = item.model_copy(update={"complete_the_look": complete_look})
                         complete_looks_generated += 1
             
             completion_time = int((time.time() - completion_start) * 1000)
@@ -0,0 +1,201 @@
+"""
+Semantic response cache for the recommendation endpoints
+Near-duplicate requests are matched on the cosine similarity of their key embeddings
+so repeated prompts skip the full RAG pipeline
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from app.config import settings
+from app.utils.logging import get_logger
+
+# Optional heavy dependency - graceful fallback if not available
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+class SemanticCache:
+    """
+    In-memory semantic cache with TTL expiry and LRU eviction
+    Entries are bucketed by scope and a lookup only compares against its own bucket, so entries
+    stored under other scopes can never crowd out a match. Buckets are capped in size, which keeps
+    the scan cheap: a numpy matrix product when numpy is installed, a plain cosine scan otherwise.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        ttl_seconds: Optional[int] = None,
+        max_items: Optional[int] = None,
+        max_items_per_scope: Optional[int] = None
+    ):
+        self.threshold = threshold if threshold is not None else settings.semantic_cache_threshold
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.semantic_cache_ttl_seconds
+        self.max_items = max_items if max_items is not None else settings.semantic_cache_max_items
+        self.max_items_per_scope = (
+            max_items_per_scope if max_items_per_scope is not None else settings.semantic_cache_max_items_per_scope
+        )
+
+        # entry_id -> {"embedding", "scope", "response", "ts", "hit_count"}, kept in LRU order
+        self.entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        # scope -> entry ids in that scope, in LRU order
+        self._buckets: Dict[Hashable, "OrderedDict[int, None]"] = {}
+        # scope -> (entry ids, stacked vectors), rebuilt after the bucket changes
+        self._matrices: Dict[Hashable, Tuple[List[int], Any]] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def build_key_text(gender: str, article_types: List[str], shopping_prompt: str) -> str:
+        """
+        Build the normalized text that is embedded to key the cache
+        """
+        return f"{gender}|{sorted(article_types)}|{shopping_prompt.strip().lower()}"
+
+    def _normalize(self, embedding: List[float]) -> Any:
+        """
+        L2-normalize an embedding so inner product equals cosine similarity
+        """
+        if NUMPY_AVAILABLE:
+            vector = np.asarray(embedding, dtype=np.float32)
+            magnitude = float(np.linalg.norm(vector))
+            return vector / magnitude if magnitude else vector
+        magnitude = math.sqrt(sum(value * value for value in embedding))
+        if magnitude == 0.0:
+            return list(embedding)
+        return [value / magnitude for value in embedding]
+
+    def has_scope(self, scope: Hashable) -> bool:
+        """
+        Whether anything is stored under the scope; lookups in other scopes always miss
+        """
+        return scope in self._buckets
+
+    def lookup(self, embedding: List[float], scope: Hashable) -> Optional[Any]:
+        """
+        Return the cached response for the nearest fresh entry in the same scope,
+        or None when nothing clears the similarity threshold
+        """
+        if scope not in self._buckets:
+            self.misses += 1
+            return None
+
+        query = self._normalize(embedding)
+        now = time.time()
+
+        for entry_id, score in self._candidates(query, scope):
+            if score < self.threshold:
+                break
+
+            entry = self.entries.get(entry_id)
+            if entry is None:
+                continue
+
+            if now - entry["ts"] > self.ttl_seconds:
+                self._evict(entry_id)
+                continue
+
+            entry["hit_count"] += 1
+            self.entries.move_to_end(entry_id)
+            self._buckets[scope].move_to_end(entry_id)
+            self.hits += 1
+            logger.info(f"Semantic cache hit (similarity {score:.3f}, hits {entry['hit_count']})")
+            return entry["response"]
+
+        self.misses += 1
+        return None
+
+    def _candidates(self, query: Any, scope: Hashable) -> List[Tuple[int, float]]:
+        """
+        Entries in the scope ordered by similarity to the query (highest first)
+        """
+        if NUMPY_AVAILABLE:
+            ids, matrix = self._matrix(scope)
+            if not ids or matrix.shape[1] != len(query):
+                return []
+            scores = matrix @ query
+            order = np.argsort(-scores)
+            return [(ids[i], float(scores[i])) for i in order]
+
+        # Custom cosine scan - vectors are already normalized so the dot product is enough
+        scored = []
+        for entry_id in self._buckets[scope]:
+            vector = self.entries[entry_id]["embedding"]
+            if len(vector) != len(query):
+                continue
+            scored.append((entry_id, sum(a * b for a, b in zip(query, vector))))
+        scored.sort(key=lambda x: x[1], reverse=True)
+        return scored
+
+    def _matrix(self, scope: Hashable) -> Tuple[List[int], Any]:
+        """
+        Stacked vectors of a scope's entries, cached until the bucket changes
+        """
+        cached = self._matrices.get(scope)
+        if cached is None:
+            ids = list(self._buckets[scope])
+            dimension = len(self.entries[ids[0]]["embedding"])
+            # Entries of another dimension (a changed embedding model) can never match; leave them out
+            ids = [entry_id for entry_id in ids if len(self.entries[entry_id]["embedding"]) == dimension]
+            cached = (ids, np.stack([self.entries[entry_id]["embedding"] for entry_id in ids]))
+            self._matrices[scope] = cached
+        return cached
+
+    def store(self, embedding: List[float], scope: Hashable, response: Any) -> None:
+        """
+        Add a response to the cache, evicting least recently used entries past the
+        per-scope and overall limits
+        """
+        entry_id = self._next_id
+        self._next_id += 1
+
+        self.entries[entry_id] = {
+            "embedding": self._normalize(embedding),
+            "scope": scope,
+            "response": response,
+            "ts": time.time(),
+            "hit_count": 0
+        }
+        bucket = self._buckets.setdefault(scope, OrderedDict())
+        bucket[entry_id] = None
+        self._matrices.pop(scope, None)
+
+        while len(bucket) > self.max_items_per_scope:
+            self._evict(next(iter(bucket)))
+        while len(self.entries) > self.max_items:
+            self._evict(next(iter(self.entries)))
+
+    def _evict(self, entry_id: int) -> None:
+        """
+        Remove an entry from the entry table and its scope bucket
+        """
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        scope = entry["scope"]
+        bucket = self._buckets.get(scope)
+        if bucket is not None:
+            bucket.pop(entry_id, None)
+            if not bucket:
+                del self._buckets[scope]
+        self._matrices.pop(scope, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics for debugging
+        """
+        return {
+            "entries": len(self.entries),
+            "scopes": len(self._buckets),
+            "hits": self.hits,
+            "misses": self.misses,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "backend": "numpy" if NUMPY_AVAILABLE else "cosine"
+        }
@@ -0,0 +1,87 @@
+"""
+Session storage for recommendation sessions
+Uses Redis when configured so any worker can serve any session, otherwise an in-process TTL cache
+"""
+import json
+from typing import Any, Dict, Optional
+from app.config import settings
+from app.utils.logging import get_logger
+from app.utils.ttl_cache import TTLCache
+
+# Optional Redis dependency - graceful fallback to in-process storage
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+class SessionStore:
+    def __init__(
+        self,
+        ttl_sec: Optional[int] = None,
+        max_items: Optional[int] = None,
+        redis_url: Optional[str] = None
+    ):
+        self.ttl_sec = ttl_sec if ttl_sec is not None else settings.session_ttl_seconds
+        self.local = TTLCache(
+            max_items=max_items if max_items is not None else settings.session_max_items,
+            ttl_sec=self.ttl_sec
+        )
+        self.redis = None
+
+        redis_url = redis_url if redis_url is not None else settings.redis_url
+        if redis_url:
+            if REDIS_AVAILABLE:
+                pool = aioredis.ConnectionPool.from_url(
+                    redis_url,
+                    max_connections=settings.redis_max_connections
+                )
+                self.redis = aioredis.Redis(connection_pool=pool)
+                logger.info("Using Redis session store")
+            else:
+                logger.warning("REDIS_URL is set but redis is not installed, using in-process sessions")
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self.redis is not None else "memory"
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"sess:{session_id}"
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get session data, or None if unknown or expired
+        """
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(self._key(session_id))
+                return json.loads(raw) if raw is not None else None
+            except Exception as e:
+                logger.error(f"Redis session read failed, using in-process store: {e}")
+        return self.local.get(session_id)
+
+    async def set(self, session_id: str, data: Dict[str, Any]) -> None:
+        """
+        Store session data, restarting its TTL
+        """
+        if self.redis is not None:
+            try:
+                await self.redis.set(self._key(session_id), json.dumps(data, default=str), ex=self.ttl_sec)
+                return
+            except Exception as e:
+                logger.error(f"Redis session write failed, using in-process store: {e}")
+        self.local.set(session_id, data)
+
+    def count_local(self) -> int:
+        """
+        Number of live sessions held in this process
+        """
+        self.local.purge_expired()
+        return len(self.local)
+
+    async def close(self) -> None:
+        if self.redis is not None:
+            await self.redis.aclose()
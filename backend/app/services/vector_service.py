@@ -5,6 +5,7 @@ import json
 import math
 from typing import List, Dict, Tuple, Optional
 from app.config import settings
+from app.utils.data_paths import resolve_styles_csv_path
 from app.utils.logging import get_logger
 from app.models.responses import ProductItem
 
@@ -39,6 +40,13 @@ class VectorSearchService:
         self.dimension = None
         self.fallback_mode = True  # Start in fallback mode by default
         self.openai_service = None  # Will be set when needed
+        self._id_to_meta: Dict[str, Dict] = {}  # Product ID -> metadata row for direct lookups
+        # Column-wise (SoA) views of FAISS-aligned metadata for vectorized filtering
+        self._index_rows: List[Dict] = []
+        self._col_ids = None
+        self._col_genders = None
+        self._col_article_codes = None
+        self._article_type_to_code: Dict[str, int] = {}
         
     async def load_or_create_index(self) -> bool:
         """
@@ -51,8 +59,16 @@ class VectorSearchService:
                 # Try to load existing FAISS index
                 if os.path.exists(settings.faiss_index_path) and os.path.exists(settings.metadata_path):
                     logger.info("Loading existing FAISS index...")
-                    self.index = faiss.read_index(settings.faiss_index_path)
-                    
+                    self.index = self._read_faiss_index(settings.faiss_index_path)
+                
+                if self.index is not None and self.index.d != settings.embedding_dimension:
+                    # Built with another embedding model/size: query vectors wouldn't be comparable
+                    logger.warning(
+                        f"FAISS index dimension {self.index.d} does not match embedding dimension "
+                        f"{settings.embedding_dimension}, re-embedding the catalog instead"
+                    )
+                    self.index = None
+                elif self.index is not None:
                     with open(settings.metadata_path, 'rb') as f:
                         self.metadata = pickle.load(f)
                     
@@ -65,6 +81,9 @@ class VectorSearchService:
                         self.df = pd.read_csv(settings.styles_csv_path)
                     
                     self.dimension = self.index.d
+                    rows = self.metadata if self.metadata else self.df.to_dict('records')
+                    self._build_id_lookup(rows)
+                    self._build_filter_columns(rows)
                     self.fallback_mode = False
                     logger.info(f"MODE A: Loaded FAISS index with {self.index.ntotal} vectors, dimension {self.dimension}")
                     self.mode = "A"
@@ -105,6 +124,18 @@ class VectorSearchService:
             logger.error(f"Error loading FAISS index: {e}")
             return await self._initialize_embedding_mode()
     
+    def _read_faiss_index(self, path: str):
+        """
+        Read the FAISS index, memory-mapped read-only when enabled
+        Mapped pages live in the OS page cache, so multiple workers share one copy of the vectors
+        """
+        if settings.faiss_index_mmap:
+            try:
+                return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except Exception as e:
+                logger.warning(f"Memory-mapped FAISS load failed, reading index into memory: {e}")
+        return faiss.read_index(path)
+
     async def _initialize_embedding_mode(self) -> bool:
         """
         Initialize with CSV data and prepare for on-demand embedding generation
@@ -115,25 +146,8 @@ class VectorSearchService:
             logger.info(f"Current working directory: {os.getcwd()}")
             logger.info(f"Data directory exists: {os.path.exists(settings.data_dir)}")
             
-            # Try to find and load the CSV file
-            csv_path = None
-            if os.path.exists(settings.styles_csv_path):
-                csv_path = settings.styles_csv_path
-            else:
-                # Try alternative paths
-                alternative_paths = [
-                    "backend/data/sample_styles.csv",
-                    "../data/sample_styles.csv", 
-                    "./data/sample_styles.csv",
-                    "sample_styles.csv"
-                ]
-                
-                for alt_path in alternative_paths:
-                    logger.info(f"Trying alternative path: {alt_path}")
-                    if os.path.exists(alt_path):
-                        csv_path = alt_path
-                        logger.info(f"Found CSV at alternative path: {alt_path}")
-                        break
+            # Find the CSV file (resolved once, shared with /debug/data)
+            csv_path = resolve_styles_csv_path()
             
             if csv_path:
                 logger.info("Loading CSV data...")
@@ -153,6 +167,8 @@ class VectorSearchService:
                             self.products_data.append(row)
                     logger.info(f"Loaded {len(self.products_data)} products without pandas")
                 
+                self._build_id_lookup(self.products_data)
+                
                 # Don't generate embeddings at startup to avoid timeouts
                 # Instead, we'll generate them on-demand or use a simpler similarity approach
                 logger.info("CSV data loaded successfully. Embeddings will be generated on-demand.")
@@ -160,7 +176,6 @@ class VectorSearchService:
                 self.fallback_mode = False  # We have data loaded
                 return True
             else:
-                logger.error("No CSV file found in any location")
                 return False
                 
         except Exception as e:
@@ -186,22 +201,9 @@ class VectorSearchService:
                 description = self._create_product_description(product)
                 product_descriptions.append(description)
             
-            # Generate embeddings in batches to be cost-efficient
-            batch_size = 100  # Process in batches to avoid API limits
-            all_embeddings = []
-            
-            for i in range(0, len(product_descriptions), batch_size):
-                batch = product_descriptions[i:i + batch_size]
-                logger.info(f"Generating embeddings for batch {i//batch_size + 1}/{(len(product_descriptions) + batch_size - 1)//batch_size}")
-                
-                try:
-                    batch_embeddings = await self.openai_service.get_embeddings_batch(batch)
-                    all_embeddings.extend(batch_embeddings)
-                except Exception as e:
-                    logger.error(f"Error generating embeddings for batch: {e}")
-                    # Create zero embeddings as fallback
-                    zero_embedding = [0.0] * 1536  # text-embedding-3-large dimension
-                    all_embeddings.extend([zero_embedding] * len(batch))
+            # Generate embeddings in one call: the service splits them into API-sized chunks
+            # and requests those concurrently, falling back to zero embeddings per failed chunk
+            all_embeddings = await self.openai_service.get_embeddings_batch(product_descriptions)
             
             # Combine products with their embeddings
             self.products_with_embeddings = []
@@ -217,6 +219,35 @@ class VectorSearchService:
             # Fallback: use products without embeddings (will use random selection)
             self.products_with_embeddings = []
     
+    def _build_id_lookup(self, rows: List[Dict]) -> None:
+        """
+        Index metadata rows by product ID for O(1) lookups
+        """
+        self._id_to_meta = {str(row["id"]): row for row in rows if "id" in row}
+    
+    def _build_filter_columns(self, rows: List[Dict]) -> None:
+        """
+        Build NumPy columns aligned with FAISS positions so filters run as array masks
+        Article types are interned to int32 codes for cheap membership tests
+        """
+        self._index_rows = rows
+        self._article_type_to_code = {}
+        article_codes = []
+        for row in rows:
+            article_type = row.get('articleType', '')
+            code = self._article_type_to_code.setdefault(article_type, len(self._article_type_to_code))
+            article_codes.append(code)
+
+        self._col_ids = np.array([str(row.get('id', '')) for row in rows], dtype=object)
+        self._col_genders = np.array([row.get('gender', '') for row in rows], dtype=object)
+        self._col_article_codes = np.array(article_codes, dtype=np.int32)
+
+    def get_by_id(self, product_id: str) -> Optional[Dict]:
+        """
+        Get the raw metadata row for a product ID, or None if unknown
+        """
+        return self._id_to_meta.get(str(product_id))
+    
     def _create_product_description(self, product: Dict) -> str:
         """
         Create rich product description for embedding generation
@@ -315,24 +346,23 @@ class VectorSearchService:
         query_vector = np.array([query_embedding]).astype('float32')
         search_k = min(k * 3, self.index.ntotal)
         distances, indices = self.index.search(query_vector, search_k)
+        distances, indices = distances[0], indices[0]
+        
+        # Filter the candidates with array masks over the metadata columns
+        mask = indices >= 0  # FAISS pads with -1 when it has fewer hits
+        positions = np.where(mask, indices, 0)
+        if gender_filter:
+            mask &= self._col_genders[positions] == gender_filter
+        if article_type_filter:
+            allowed_codes = [self._article_type_to_code[t] for t in article_type_filter if t in self._article_type_to_code]
+            mask &= np.isin(self._col_article_codes[positions], allowed_codes)
+        if exclude_ids:
+            mask &= ~np.isin(self._col_ids[positions], list(exclude_ids))
         
         results = []
-        for distance, idx in zip(distances[0], indices[0]):
-            if len(results) >= k:
-                break
-                
-            product_data = self.metadata[idx] if self.metadata else self.df.iloc[idx].to_dict()
-            product_id = str(product_data['id'])
-            
-            if product_id in exclude_ids:
-                continue
-            
-            similarity_score = 1.0 / (1.0 + distance)
-            if gender_filter and product_data.get('gender', '') != gender_filter:
-                continue
-            if article_type_filter and product_data.get('articleType', '') not in article_type_filter:
-                continue
-            product_item = self._create_product_item(product_data, similarity_score)
+        for distance, idx in zip(distances[mask][:k], indices[mask][:k]):
+            similarity_score = 1.0 / (1.0 + float(distance))
+            product_item = self._create_product_item(self._index_rows[idx], similarity_score)
             results.append((product_item, similarity_score))
         
         return results
@@ -527,6 +557,8 @@ class VectorSearchService:
         self.index.add(embeddings_array)
         
         self.metadata = metadata
+        self._build_id_lookup(metadata)
+        self._build_filter_columns(metadata)
         
         # Save index and metadata
         os.makedirs(os.path.dirname(settings.faiss_index_path), exist_ok=True)
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional
+
+# Status codes that mean the API is overloaded or throttling us
+_OVERLOAD_STATUS = frozenset({429, 500, 502, 503, 504})
+
+def _is_overload(exc: BaseException) -> bool:
+    """
+    Whether a failed call should shrink concurrency
+    Client errors (bad input, auth) say nothing about capacity; timeouts and connection errors do
+    """
+    status = getattr(exc, "status_code", None)
+    return status is None or status in _OVERLOAD_STATUS
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit tuned by AIMD from observed latency and overload errors
+    Each call that finishes fast raises the limit additively; an overload error, or a window whose
+    mean latency exceeds the target, halves it. Used as `async with limiter.slot():` around one API call.
+    """
+
+    def __init__(
+        self,
+        initial: float,
+        min_limit: float = 1,
+        max_limit: float = 32,
+        latency_target_sec: float = 2.0,
+        window: int = 20,
+        increase: float = 0.5,
+        decrease_factor: float = 0.5
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = min(max(float(initial), min_limit), max_limit)
+        self.latency_target_sec = latency_target_sec
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._in_flight = 0
+        # Futures rather than an asyncio.Condition so the limiter isn't bound to one event loop
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def acquire(self) -> None:
+        while self._in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # A wake-up that arrived just before cancellation goes to the next waiter
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+            finally:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+        self._in_flight += 1
+
+    def release(self, latency_sec: Optional[float] = None, exc: Optional[BaseException] = None) -> None:
+        """
+        Free a slot and adjust the limit from the call's outcome
+        Calls without a latency (cancelled, or failed for non-capacity reasons) leave the limit alone
+        """
+        self._in_flight -= 1
+        if exc is not None and _is_overload(exc):
+            self._decrease()
+        elif latency_sec is not None:
+            self._latencies.append(latency_sec)
+            if sum(self._latencies) / len(self._latencies) > self.latency_target_sec:
+                self._decrease()
+            else:
+                self.limit = min(self.limit + self.increase, self.max_limit)
+        self._wake()
+
+    def _decrease(self) -> None:
+        self.limit = max(self.limit * self.decrease_factor, self.min_limit)
+        # Start a fresh window so one slow stretch isn't counted against the new limit too
+        self._latencies.clear()
+
+    def _wake(self) -> None:
+        free = int(self.limit) - self._in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one unit of concurrency for the duration of a call and feed its outcome back
+        """
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        except Exception as e:
+            self.release(exc=e)
+            raise
+        self.release(latency_sec=time.monotonic() - started)
@@ -0,0 +1,33 @@
+import os
+from typing import Optional
+from app.config import settings
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Fallback locations for the styles CSV, for deployments started from another working directory
+STYLES_CSV_ALTERNATIVE_PATHS = [
+    "backend/data/sample_styles.csv",
+    "../data/sample_styles.csv",
+    "./data/sample_styles.csv",
+    "sample_styles.csv"
+]
+
+def resolve_styles_csv_path(rescan: bool = False) -> Optional[str]:
+    """
+    Find the styles CSV once and remember it in settings.resolved_csv_path
+    Pass rescan=True to probe the candidate locations again
+    """
+    if settings.resolved_csv_path and not rescan:
+        return settings.resolved_csv_path
+
+    for path in [settings.styles_csv_path] + STYLES_CSV_ALTERNATIVE_PATHS:
+        if os.path.exists(path):
+            if path != settings.styles_csv_path:
+                logger.info(f"Found CSV at alternative path: {path}")
+            settings.resolved_csv_path = path
+            return path
+
+    logger.error("No CSV file found in any location")
+    settings.resolved_csv_path = None
+    return None
@@ -1,8 +1,10 @@
+import asyncio
 import tiktoken
 import concurrent.futures
 from openai import AsyncOpenAI
 from typing import List, Dict, Any, Union
 from app.config import settings
+from app.utils.http_client import OPENAI_TIMEOUT, get_http_client
 from app.utils.retry import openai_retry
 from app.utils.logging import get_logger
 
@@ -29,7 +31,11 @@ logger = get_logger(__name__)
 
 class EmbeddingGenerator:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=get_http_client(),
+            timeout=OPENAI_TIMEOUT
+        )
         self.encoding = tiktoken.get_encoding("cl100k_base")
     
     @openai_retry
@@ -40,7 +46,7 @@ class EmbeddingGenerator:
         """
         response = await self.client.embeddings.create(
             input=input_texts,
-            model=settings.embedding_model
+            **settings.embedding_options
         )
         return [data.embedding for data in response.data]
     
@@ -83,30 +89,31 @@ class EmbeddingGenerator:
             f"{num_tokens} tokens, estimated cost: ${cost_estimate:.4f}"
         )
         
-        # Process in batches
-        all_embeddings = []
+        # Process in batches, several requests in flight at once
         batches = list(self.batchify(truncated_corpus, batch_size))
+        semaphore = asyncio.Semaphore(settings.embedding_concurrency)
+        pbar = tqdm(total=len(corpus), desc="Generating embeddings") if TQDM_AVAILABLE else None
         
-        # Use tqdm if available, otherwise simple iteration
-        if TQDM_AVAILABLE:
-            with tqdm(total=len(corpus), desc="Generating embeddings") as pbar:
-                for batch in batches:
-                    try:
-                        batch_embeddings = await self.get_embeddings(batch)
-                        all_embeddings.extend(batch_embeddings)
-                        pbar.update(len(batch))
-                    except Exception as e:
-                        logger.error(f"Failed to generate embeddings for batch: {e}")
-                        raise
-        else:
-            for i, batch in enumerate(batches):
-                try:
+        async def embed_batch(i: int, batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                if pbar is None:
                     logger.info(f"Processing batch {i+1}/{len(batches)}")
+                try:
                     batch_embeddings = await self.get_embeddings(batch)
-                    all_embeddings.extend(batch_embeddings)
                 except Exception as e:
                     logger.error(f"Failed to generate embeddings for batch: {e}")
                     raise
+                if pbar is not None:
+                    pbar.update(len(batch))
+                return batch_embeddings
+        
+        try:
+            # gather keeps batch order, so embeddings line up with the corpus
+            results = await asyncio.gather(*(embed_batch(i, batch) for i, batch in enumerate(batches)))
+        finally:
+            if pbar is not None:
+                pbar.close()
+        all_embeddings = [embedding for batch_embeddings in results for embedding in batch_embeddings]
         
         logger.info("Successfully generated all embeddings")
         return all_embeddings
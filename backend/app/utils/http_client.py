@@ -0,0 +1,53 @@
+import httpx
+from typing import Optional
+from app.config import settings
+from app.utils.logging import get_logger
+from app.utils.rate_limit import RateLimitGate
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+# Timeout for OpenAI clients; the SDK applies its own per request, overriding the HTTP client's
+OPENAI_TIMEOUT = httpx.Timeout(settings.openai_timeout_seconds, connect=settings.openai_connect_timeout_seconds)
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Shared with the client so throttling state survives client re-creation
+rate_limit_gate = RateLimitGate()
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the process-wide HTTP client shared by all OpenAI clients
+    Keeps connections alive across requests and multiplexes them over HTTP/2 when available,
+    and holds requests back when OpenAI's rate-limit headers say the budget is nearly spent
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=settings.openai_http_max_connections,
+                max_keepalive_connections=settings.openai_http_max_connections
+            ),
+            event_hooks={
+                "request": [rate_limit_gate.before_request],
+                "response": [rate_limit_gate.after_response]
+            }
+        )
+        logger.info(f"Created shared HTTP client (http2={HTTP2_AVAILABLE})")
+    return _http_client
+
+async def close_http_client() -> None:
+    """
+    Close the shared HTTP client on shutdown
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -1,21 +1,92 @@
+import atexit
+import json
 import logging
+import queue
 import sys
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 from app.config import settings
 
+# Optional fast JSON encoder for structured logs
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Structured fields passed through logger calls via extra={...}
+_JSON_EXTRA_FIELDS = ("rid", "method", "path", "client", "status", "dur_ms")
+
+# ID of the request being handled, set by the request logging middleware
+request_id_var: ContextVar[str] = ContextVar("request_id", default="unknown")
+
+# Background writer thread draining queued log records
+_queue_listener: Optional[QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """
+    Render log records as single-line JSON objects
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": record.created,
+            "lvl": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for field in _JSON_EXTRA_FIELDS:
+            value = record.__dict__.get(field)
+            if value is not None:
+                payload[field] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(payload, default=str).decode()
+        return json.dumps(payload, default=str)
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamp every record with the current request ID as "rid"
+    Attached to the handler so it runs in the calling thread, before records are queued, while the context is bound
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if "rid" not in record.__dict__:
+            record.rid = request_id_var.get()
+        return True
+
 def setup_logging(level: Optional[str] = None) -> None:
     """
     Setup logging configuration for the application
     """
+    global _queue_listener
     log_level = level or settings.log_level
     
+    # Console output, as JSON lines when LOG_FORMAT=json
+    handler = logging.StreamHandler(sys.stdout)
+    if settings.log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    
+    # Hand records to a queue so request paths never block on stream writes;
+    # a listener thread does the formatting and I/O
+    if settings.log_queue_enabled and _queue_listener is None:
+        log_queue = queue.SimpleQueue()
+        _queue_listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        _queue_listener.start()
+        atexit.register(stop_logging)
+        handler = QueueHandler(log_queue)
+        handler.setFormatter(logging.Formatter('%(message)s'))  # Listener applies the real format
+    handler.addFilter(RequestIdFilter())
+    
     # Configure root logger
     logging.basicConfig(
         level=getattr(logging, log_level.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout),  # Console output
-        ]
+        handlers=[handler]
     )
     
     # Set specific logger levels
@@ -29,6 +100,15 @@ def setup_logging(level: Optional[str] = None) -> None:
     get_logger("recommendation_service")
     get_logger("api")
 
+def stop_logging() -> None:
+    """
+    Flush queued log records and stop the background writer
+    """
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
 def get_logger(name: str) -> logging.Logger:
     """
     Get a logger instance for the given name
@@ -0,0 +1,85 @@
+import asyncio
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+import httpx
+from app.config import settings
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# OpenAI reset durations look like "20ms", "1s", "6m0s" or "1h2m3.5s"
+_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def parse_reset_duration(value: str) -> Optional[float]:
+    """
+    Seconds in an x-ratelimit-reset-* header value, None if it can't be read
+    """
+    parts = _DURATION_PART_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+class RateLimitGate:
+    """
+    Admission control for OpenAI requests, applied as httpx event hooks on the shared client
+    Reads x-ratelimit-* headers from every response and holds new requests to an endpoint until
+    its request budget resets once almost none is left. An optional sliding-window requests-per-minute
+    cap throttles before any headers have been seen. Waits are capped so throttling never outlasts
+    what the request timeouts allow; anything past that is left to the retry policy.
+    """
+
+    def __init__(
+        self,
+        rpm_limit: Optional[int] = None,
+        max_wait_sec: Optional[float] = None,
+        min_remaining_fraction: float = 0.1
+    ):
+        self.rpm_limit = rpm_limit if rpm_limit is not None else settings.openai_rpm_limit
+        self.max_wait_sec = max_wait_sec if max_wait_sec is not None else settings.openai_throttle_max_wait_seconds
+        self.min_remaining_fraction = min_remaining_fraction
+        # Monotonic time until which each endpoint path is held back
+        self._blocked_until: Dict[str, float] = {}
+        self._window: Deque[float] = deque()
+
+    async def before_request(self, request: httpx.Request) -> None:
+        now = time.monotonic()
+        wait = self._blocked_until.get(request.url.path, 0.0) - now
+
+        if self.rpm_limit:
+            while self._window and self._window[0] <= now - 60:
+                self._window.popleft()
+            if len(self._window) >= self.rpm_limit:
+                wait = max(wait, self._window[0] + 60 - now)
+
+        if wait > 0:
+            wait = min(wait, self.max_wait_sec)
+            logger.info(f"Throttling OpenAI request to {request.url.path} for {wait:.2f}s")
+            await asyncio.sleep(wait)
+
+        if self.rpm_limit:
+            self._window.append(time.monotonic())
+
+    async def after_response(self, response: httpx.Response) -> None:
+        headers = response.headers
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        limit = headers.get("x-ratelimit-limit-requests")
+        reset = headers.get("x-ratelimit-reset-requests")
+        if remaining is None or limit is None or reset is None:
+            return
+
+        try:
+            remaining_count = int(remaining)
+            limit_count = int(limit)
+        except ValueError:
+            return
+        if remaining_count >= max(2, self.min_remaining_fraction * limit_count):
+            return
+
+        reset_sec = parse_reset_duration(reset)
+        if reset_sec:
+            path = response.request.url.path
+            self._blocked_until[path] = max(self._blocked_until.get(path, 0.0), time.monotonic() + reset_sec)
+            logger.warning(f"OpenAI request budget low for {path} ({remaining_count}/{limit_count}), holding for {reset_sec:.2f}s")
@@ -0,0 +1,39 @@
+import pytest
+from app.services.completion_service import CompletionService
+
+np = pytest.importorskip("numpy")
+
+@pytest.fixture(scope="module")
+def service() -> CompletionService:
+    return CompletionService()
+
+def stable_top_k(keys: "np.ndarray", k: int) -> "np.ndarray":
+    return np.argsort(keys, axis=1, kind="stable")[:, :k]
+
+@pytest.mark.parametrize("seed", range(50))
+def test_matches_stable_argsort_with_ties(service, seed):
+    rng = np.random.default_rng(seed)
+    rows, cols = rng.integers(1, 12), rng.integers(1, 40)
+    # Few distinct values so most rows have ties at and around the k-th key; inf marks rejected candidates
+    keys = rng.choice([-90.0, -75.5, -60.0, -52.25, np.inf], size=(rows, cols))
+
+    expected = stable_top_k(keys, service.max_suggestions_per_category)
+
+    np.testing.assert_array_equal(service._top_k_rows(keys), expected)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_stable_argsort_on_distinct_scores(service, seed):
+    rng = np.random.default_rng(seed)
+    keys = -rng.random((8, 200)) * 100
+
+    np.testing.assert_array_equal(service._top_k_rows(keys), stable_top_k(keys, service.max_suggestions_per_category))
+
+def test_all_keys_equal_keeps_column_order(service):
+    keys = np.zeros((2, 10))
+
+    np.testing.assert_array_equal(service._top_k_rows(keys), [[0, 1, 2], [0, 1, 2]])
+
+def test_rows_narrower_than_k_are_fully_sorted(service):
+    keys = np.array([[3.0, 1.0], [np.inf, -1.0]])
+
+    np.testing.assert_array_equal(service._top_k_rows(keys), [[1, 0], [1, 0]])
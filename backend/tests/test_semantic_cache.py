@@ -0,0 +1,142 @@
+import asyncio
+import pytest
+from app.api import routes
+from app.config import settings
+from app.models.requests import FilterOptions, RecommendationRequest, UserProfile
+from app.services import semantic_cache
+from app.services.semantic_cache import SemanticCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture(params=["numpy", "cosine"])
+def backend(request, monkeypatch):
+    """Run each test against the numpy matrix scan and the pure-Python fallback"""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(semantic_cache, "NUMPY_AVAILABLE", request.param == "numpy")
+    return request.param
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(semantic_cache, "time", fake)
+    return fake
+
+def make_cache(**kwargs) -> SemanticCache:
+    options = {"threshold": 0.9, "ttl_seconds": 60, "max_items": 100, "max_items_per_scope": 10}
+    options.update(kwargs)
+    return SemanticCache(**options)
+
+def test_hit_on_similar_embedding(backend, clock):
+    cache = make_cache()
+    cache.store([1.0, 0.0, 0.0], "scope", "response")
+
+    assert cache.lookup([0.99, 0.05, 0.0], "scope") == "response"
+    assert cache.get_stats()["backend"] == backend
+
+def test_entry_expires_after_ttl(backend, clock):
+    cache = make_cache(ttl_seconds=60)
+    cache.store([1.0, 0.0], "scope", "response")
+
+    clock.now += 60
+    assert cache.lookup([1.0, 0.0], "scope") == "response"
+
+    clock.now += 1
+    assert cache.lookup([1.0, 0.0], "scope") is None
+    assert cache.get_stats()["entries"] == 0
+    assert cache.get_stats()["scopes"] == 0
+
+def test_evicts_least_recently_used_past_max_items(backend, clock):
+    cache = make_cache(max_items=2)
+    cache.store([1.0, 0.0], "a", "first")
+    cache.store([1.0, 0.0], "b", "second")
+    # Touch the oldest entry so the second one becomes least recently used
+    assert cache.lookup([1.0, 0.0], "a") == "first"
+
+    cache.store([1.0, 0.0], "c", "third")
+
+    assert cache.lookup([1.0, 0.0], "a") == "first"
+    assert cache.lookup([1.0, 0.0], "b") is None
+    assert cache.lookup([1.0, 0.0], "c") == "third"
+
+def test_evicts_least_recently_used_past_max_items_per_scope(backend, clock):
+    cache = make_cache(max_items_per_scope=2)
+    cache.store([1.0, 0.0, 0.0], "scope", "x")
+    cache.store([0.0, 1.0, 0.0], "scope", "y")
+    cache.store([0.0, 0.0, 1.0], "scope", "z")
+
+    assert cache.lookup([1.0, 0.0, 0.0], "scope") is None
+    assert cache.lookup([0.0, 1.0, 0.0], "scope") == "y"
+    assert cache.lookup([0.0, 0.0, 1.0], "scope") == "z"
+
+def test_lookup_never_crosses_scopes(backend, clock):
+    cache = make_cache()
+    cache.store([1.0, 0.0], "men", "response")
+
+    assert cache.lookup([1.0, 0.0], "women") is None
+    assert not cache.has_scope("women")
+    assert cache.has_scope("men")
+
+def test_other_scopes_do_not_crowd_out_a_match(backend, clock):
+    cache = make_cache(max_items=1000, max_items_per_scope=1000)
+    for i in range(200):
+        cache.store([1.0, 0.0, i / 1000], ("other", i % 4), f"other-{i}")
+    cache.store([0.9, 0.1, 0.0], "mine", "mine")
+
+    assert cache.lookup([1.0, 0.0, 0.0], "mine") == "mine"
+
+def test_threshold_is_inclusive(backend, clock):
+    # Cosine similarity of these two vectors is exactly 0.5
+    stored, query = [1.0, 0.0, 0.0, 0.0], [1.0, 1.0, 1.0, 1.0]
+
+    at_threshold = make_cache(threshold=0.5)
+    at_threshold.store(stored, "scope", "response")
+    assert at_threshold.lookup(query, "scope") == "response"
+
+    above_threshold = make_cache(threshold=0.5001)
+    above_threshold.store(stored, "scope", "response")
+    assert above_threshold.lookup(query, "scope") is None
+
+class FakeOpenAIService:
+    def __init__(self):
+        self.calls = []
+
+    async def get_query_embedding(self, text: str):
+        self.calls.append(text)
+        return [1.0, 0.0]
+
+def make_request(**kwargs) -> RecommendationRequest:
+    return RecommendationRequest(
+        user_profile=UserProfile(shopping_prompt="Blue shirts for work", gender="Men", preferred_article_types=["Shirts"]),
+        **kwargs
+    )
+
+@pytest.fixture
+def cache_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "semantic_cache_enabled", True)
+
+def test_cache_key_for_plain_request(cache_enabled):
+    service = FakeOpenAIService()
+
+    key = asyncio.run(routes._semantic_cache_key(make_request(), service))
+
+    assert key is not None
+    scope, embedding = key
+    assert scope[0] == "Men"
+    assert embedding == [1.0, 0.0]
+    assert len(service.calls) == 1
+
+@pytest.mark.parametrize("request_kwargs", [
+    {"inspiration_images": ["https://example.com/look.jpg"]},
+    {"filters": FilterOptions(exclude_ids=["123"])}
+])
+def test_cache_bypassed_without_embedding(cache_enabled, request_kwargs):
+    service = FakeOpenAIService()
+
+    assert asyncio.run(routes._semantic_cache_key(make_request(**request_kwargs), service)) is None
+    assert service.calls == []
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import httpx
+import pytest
+from app.middleware.single_flight import SingleFlightMiddleware
+
+V2_PATH = "/api/v1/recommendations/v2"
+
+class HeldApp:
+    """
+    ASGI app that holds every request until released, so concurrent requests overlap
+    """
+
+    def __init__(self, fail_first: bool = False):
+        self.calls = 0
+        self.fail_first = fail_first
+        self.release = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        call = self.calls
+        message = await receive()
+        await self.release.wait()
+        if self.fail_first and call == 1:
+            raise RuntimeError("leader failed")
+        await send({
+            "type": "http.response.start",
+            "status": 201,
+            "headers": [(b"content-type", b"application/json"), (b"x-call", str(call).encode())]
+        })
+        await send({"type": "http.response.body", "body": b'{"echo": ' + (message["body"] or b"null") + b"}"})
+
+async def send_concurrently(app: HeldApp, count: int, method: str, url: str, body=None):
+    middleware = SingleFlightMiddleware(app, post_paths=[V2_PATH])
+    transport = httpx.ASGITransport(app=middleware, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        content = json.dumps(body).encode() if body is not None else None
+        tasks = [asyncio.create_task(client.request(method, url, content=content)) for _ in range(count)]
+        # Let every request reach the handler or start waiting on the leader
+        await asyncio.sleep(0.05)
+        app.release.set()
+        return await asyncio.gather(*tasks)
+
+def test_identical_gets_share_one_execution():
+    app = HeldApp()
+
+    async def run():
+        responses = await send_concurrently(app, 3, "GET", "/api/v1/health")
+        return responses, app.calls
+
+    responses, calls = asyncio.run(run())
+
+    assert calls == 1
+    for response in responses:
+        assert response.status_code == 201
+        assert response.headers["x-call"] == "1"
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == {"echo": None}
+
+def test_post_naming_a_session_is_coalesced_and_replayed():
+    app = HeldApp()
+    body = {"session_id": "abc", "user_profile": {"shopping_prompt": "shirts", "gender": "Men"}}
+
+    async def run():
+        responses = await send_concurrently(app, 3, "POST", V2_PATH, body)
+        return responses, app.calls
+
+    responses, calls = asyncio.run(run())
+
+    assert calls == 1
+    assert [response.json() for response in responses] == [{"echo": body}] * 3
+
+def test_waiters_run_on_their_own_after_leader_failure():
+    app = HeldApp(fail_first=True)
+
+    async def run():
+        responses = await send_concurrently(app, 3, "GET", "/api/v1/health")
+        return responses, app.calls
+
+    responses, calls = asyncio.run(run())
+
+    # The leader's failure is not replayed; each waiter re-runs the request
+    assert calls == 3
+    assert responses[0].status_code == 500
+    assert sorted(response.headers["x-call"] for response in responses[1:]) == ["2", "3"]
+    assert all(response.status_code == 201 for response in responses[1:])
+
+def test_leader_failure_does_not_leave_an_inflight_entry():
+    app = HeldApp(fail_first=True)
+
+    async def run():
+        middleware = SingleFlightMiddleware(app)
+        transport = httpx.ASGITransport(app=middleware, raise_app_exceptions=False)
+        app.release.set()
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.get("/api/v1/health")
+            second = await client.get("/api/v1/health")
+        return first, second, middleware._inflight
+
+    first, second, inflight = asyncio.run(run())
+
+    assert first.status_code == 500
+    assert second.status_code == 201
+    assert inflight == {}
+
+@pytest.mark.parametrize("method, url, body", [
+    ("POST", V2_PATH + "?stream=true", {"session_id": "abc"}),
+    ("POST", V2_PATH, {"user_profile": {"shopping_prompt": "shirts"}}),
+    ("POST", V2_PATH, {"session_id": None}),
+    ("POST", "/api/v1/tryon", {"session_id": "abc", "product_id": "1"}),
+    ("POST", "/api/v1/feedback", {"session_id": "abc", "product_id": "1", "action": "like"})
+])
+def test_requests_that_are_never_coalesced(method, url, body):
+    app = HeldApp()
+
+    async def run():
+        responses = await send_concurrently(app, 3, method, url, body)
+        return responses, app.calls
+
+    responses, calls = asyncio.run(run())
+
+    assert calls == 3
+    assert sorted(response.headers["x-call"] for response in responses) == ["1", "2", "3"]
+    # The body read for the coalescing check is still delivered to the handler
+    assert all(response.json() == {"echo": body} for response in responses)
@@ -0,0 +1,98 @@
+import pytest
+from app.utils import ttl_cache
+from app.utils.ttl_cache import TTLCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ttl_cache, "time", fake)
+    return fake
+
+def test_get_returns_value_until_expiry(clock):
+    cache = TTLCache(ttl_sec=10)
+    cache.set("key", "value")
+
+    clock.now += 10
+    assert cache.get("key") == "value"
+
+    clock.now += 0.5
+    assert cache.get("key") is None
+    # The expired entry is dropped on read
+    assert len(cache) == 0
+
+def test_get_returns_default_for_missing_and_expired(clock):
+    cache = TTLCache(ttl_sec=1)
+    sentinel = object()
+    assert cache.get("missing", sentinel) is sentinel
+
+    cache.set("key", "value")
+    clock.now += 2
+    assert cache.get("key", sentinel) is sentinel
+    assert "key" not in cache
+
+def test_per_entry_ttl_overrides_default(clock):
+    cache = TTLCache(ttl_sec=10)
+    cache.set("short", 1, ttl_sec=1)
+    cache.set("long", 2)
+
+    clock.now += 5
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+
+def test_evicts_least_recently_used_at_capacity(clock):
+    cache = TTLCache(max_items=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Reading refreshes the LRU position, leaving "b" as the oldest
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_overwriting_refreshes_position_and_ttl(clock):
+    cache = TTLCache(max_items=2, ttl_sec=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    clock.now += 8
+    cache.set("a", 10)
+
+    cache.set("c", 3)
+    assert cache.get("b") is None
+
+    clock.now += 8
+    assert cache.get("a") == 10
+
+def test_purge_expired_drops_only_expired_entries(clock):
+    cache = TTLCache(ttl_sec=10)
+    cache.set("old", 1)
+    clock.now += 5
+    cache.set("new", 2)
+    cache.set("short", 3, ttl_sec=1)
+
+    clock.now += 6
+    assert cache.purge_expired() == 2
+    assert len(cache) == 1
+    assert cache.get("new") == 2
+    assert cache.purge_expired() == 0
+
+def test_pop_and_clear(clock):
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.pop("a") == 1
+    assert cache.pop("a", "gone") == "gone"
+
+    cache.clear()
+    assert len(cache) == 0